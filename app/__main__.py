@@ -4,11 +4,30 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
+import argparse
+import asyncio
+
 import uvicorn
 
 from app.config import get_settings
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m app')
+    parser.add_argument(
+        'mode',
+        nargs='?',
+        choices=['api', 'worker'],
+        default='api',
+        help='run the http server or the worker which only consumes the finalize jobs',
+    )
+    args = parser.parse_args()
+
+    if args.mode == 'worker':
+        from app.worker import run_worker
+
+        asyncio.run(run_worker())
+        raise SystemExit(0)
+
     settings = get_settings()
     uvicorn.run(
         'app.main:create_app',
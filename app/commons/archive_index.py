@@ -0,0 +1,110 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import os
+from typing import AsyncIterator
+
+from app.commons.data_providers.redis import SrvAioRedisSingleton
+from app.config import ConfigClass
+from app.logger import logger
+from app.resources.archive_file_type_mapping import ARCHIVE_TYPES
+
+
+class EdgeCapture:
+    """
+    Summary:
+        The async iterator passes the part content through and keeps the
+        first `head_size` and the last `tail_size` bytes of it. The magic
+        bytes of an archive are in its head and the index of zip and 7z
+        is in its tail.
+    """
+
+    def __init__(self, source: AsyncIterator[bytes], head_size: int, tail_size: int) -> None:
+        self.source = source
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.head = bytearray()
+        self.tail = bytearray()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for piece in self.source:
+            if len(self.head) < self.head_size:
+                self.head += piece[: self.head_size - len(self.head)]
+            if self.tail_size:
+                self.tail += piece[-self.tail_size :]
+                del self.tail[: -self.tail_size]
+            yield piece
+
+
+def get_edge_sizes(resumable_filename: str, part_number: int, total_parts: int | None) -> tuple[int, int]:
+    """
+    Summary:
+        The function decides how many head and tail bytes of the part are
+        captured. Only the first and the last part of an archive are
+        captured, and only when the total number of parts is known.
+    Return:
+        - (head_size, tail_size)
+    """
+
+    if not ConfigClass.ARCHIVE_INDEX_CAPTURE_ENABLED or not total_parts:
+        return 0, 0
+
+    extension = os.path.splitext(resumable_filename)[1].lstrip('.')
+    if not ARCHIVE_TYPES.get(extension):
+        return 0, 0
+
+    capture_size = ConfigClass.ARCHIVE_INDEX_CAPTURE_SIZE
+    head_size = capture_size if part_number == 1 else 0
+    tail_size = capture_size if part_number == total_parts else 0
+
+    return head_size, tail_size
+
+
+def _get_keys(resumable_identifier: str) -> tuple[str, str]:
+    prefix = f'upload:archive_index:{resumable_identifier}'
+    return f'{prefix}:head', f'{prefix}:tail'
+
+
+async def save_archive_edges(resumable_identifier: str, capture: EdgeCapture) -> None:
+    """Keep the captured bytes until the upload is finalized."""
+
+    head_key, tail_key = _get_keys(resumable_identifier)
+    items = {}
+    if capture.head_size:
+        items[head_key] = bytes(capture.head)
+    if capture.tail_size:
+        items[tail_key] = bytes(capture.tail)
+
+    try:
+        await SrvAioRedisSingleton().mset_by_keys(items, ConfigClass.ARCHIVE_INDEX_CAPTURE_TTL)
+    except Exception:
+        # the preview falls back to read the object
+        logger.exception(f'Fail to save the archive index of {resumable_identifier}')
+
+
+async def pop_archive_edges(resumable_identifier: str) -> tuple[bytes | None, bytes | None]:
+    """
+    Summary:
+        The function returns the captured head and tail bytes of upload
+        and removes them from redis.
+    Return:
+        - (head, tail), either of them is None if it was not captured
+    """
+
+    if not ConfigClass.ARCHIVE_INDEX_CAPTURE_ENABLED:
+        return None, None
+
+    redis = SrvAioRedisSingleton()
+    head_key, tail_key = _get_keys(resumable_identifier)
+    try:
+        head, tail = await redis.mget_by_keys([head_key, tail_key])
+        await redis.delete_by_key(head_key)
+        await redis.delete_by_key(tail_key)
+    except Exception:
+        logger.exception(f'Fail to load the archive index of {resumable_identifier}')
+        return None, None
+
+    return head, tail
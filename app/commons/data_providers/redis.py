@@ -4,7 +4,12 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
+import time
+from typing import AsyncIterator
+
 from aioredis import StrictRedis
+from aioredis.client import PubSub
+from aioredis.exceptions import ResponseError
 
 from app.config import ConfigClass
 from app.logger import logger
@@ -45,20 +50,224 @@ class SrvAioRedisSingleton:
     async def set_by_key(self, key: str, content: str, expire_time: int = 86400):
         return await self.__instance.set(key, content, ex=expire_time)
 
-    async def mget_by_prefix(self, prefix: str):
-        query = f'{prefix}:*'
-        keys = await self.__instance.keys(query)
+    async def mget_by_keys(self, keys: list[str]) -> list:
+        if not keys:
+            return []
         return await self.__instance.mget(keys)
 
+    async def mset_by_keys(self, items: dict[str, str], expire_time: int = 86400) -> None:
+        """Set all the keys with one pipelined round trip."""
+
+        if not items:
+            return
+        async with self.__instance.pipeline(transaction=False) as pipe:
+            for key, content in items.items():
+                pipe.set(key, content, ex=expire_time)
+            await pipe.execute()
+
+    async def mset_if_not_exists(self, items: dict[str, str], expire_time: int = 86400) -> list[bool]:
+        """Set the keys which do not exist yet with one pipelined round trip.
+
+        Return whether each key was written, so the first writer of a key wins.
+        """
+
+        if not items:
+            return []
+        async with self.__instance.pipeline(transaction=False) as pipe:
+            for key, content in items.items():
+                pipe.set(key, content, ex=expire_time, nx=True)
+            results = await pipe.execute()
+        return [bool(result) for result in results]
+
+    async def getbits(self, key: str, offsets: list[int]) -> list[int]:
+        """Read the bits of the bitmap with one pipelined round trip."""
+
+        if not offsets:
+            return []
+        async with self.__instance.pipeline(transaction=False) as pipe:
+            for offset in offsets:
+                pipe.getbit(key, offset)
+            return await pipe.execute()
+
+    async def setbits(self, key: str, offsets: list[int]) -> None:
+        """Set the bits of the bitmap with one pipelined round trip."""
+
+        if not offsets:
+            return
+        async with self.__instance.pipeline(transaction=False) as pipe:
+            for offset in offsets:
+                pipe.setbit(key, offset, 1)
+            await pipe.execute()
+
+    async def lru_get(self, index_key: str, key: str) -> bytes | None:
+        """Get the cached value and mark it as recently used."""
+
+        content = await self.__instance.get(key)
+        if content is not None:
+            await self.__instance.zadd(index_key, {key: time.time()})
+        return content
+
+    async def lru_set(self, index_key: str, key: str, content: bytes) -> int:
+        """
+        Cache the value under the LRU index and return the total size of
+        cached values. The size of each value is kept in `<index_key>:sizes`
+        and their sum in `<index_key>:bytes`.
+        """
+
+        async with self.__instance.pipeline(transaction=False) as pipe:
+            pipe.set(key, content)
+            pipe.zadd(index_key, {key: time.time()})
+            pipe.hget(f'{index_key}:sizes', key)
+            pipe.hset(f'{index_key}:sizes', key, len(content))
+            pipe.incrby(f'{index_key}:bytes', len(content))
+            _, _, previous, _, total = await pipe.execute()
+
+        if previous is not None:
+            # the value is replaced, so its previous size is not counted twice
+            total = await self.__instance.decrby(f'{index_key}:bytes', int(previous))
+        return total
+
+    async def lru_evict(self, index_key: str, max_bytes: int, count: int = 16) -> int:
+        """Remove the least recently used values until the total size fits, return the number removed."""
+
+        removed = 0
+        total = int(await self.__instance.get(f'{index_key}:bytes') or 0)
+        while total > max_bytes:
+            oldest = await self.__instance.zrange(index_key, 0, count - 1)
+            if not oldest:
+                break
+            sizes = await self.__instance.hmget(f'{index_key}:sizes', oldest)
+
+            # only the values needed to fit the limit are removed from the batch
+            keys, size = [], 0
+            for key, value in zip(oldest, sizes):
+                keys.append(key)
+                size += int(value or 0)
+                if total - size <= max_bytes:
+                    break
+
+            async with self.__instance.pipeline(transaction=False) as pipe:
+                pipe.zrem(index_key, *keys)
+                pipe.unlink(*keys)
+                pipe.hdel(f'{index_key}:sizes', *keys)
+                pipe.decrby(f'{index_key}:bytes', size)
+                *_, total = await pipe.execute()
+            removed += len(keys)
+        return removed
+
+    async def hset_and_publish(
+        self, key: str, field: str, content: str, channel: str, expire_time: int = 86400
+    ) -> None:
+        """Set the field of hash and announce it on the channel with one pipelined round trip."""
+
+        async with self.__instance.pipeline(transaction=False) as pipe:
+            pipe.hset(key, field, content)
+            pipe.expire(key, expire_time)
+            pipe.publish(channel, field)
+            await pipe.execute()
+
+    async def count_fields(self, key: str) -> int:
+        return await self.__instance.hlen(key)
+
+    async def get_all_fields(self, key: str) -> dict[bytes, bytes]:
+        return await self.__instance.hgetall(key)
+
+    async def subscribe(self, channel: str) -> PubSub:
+        pubsub = self.__instance.pubsub()
+        await pubsub.subscribe(channel)
+        return pubsub
+
+    async def stream_create_group(self, stream: str, group: str) -> None:
+        """Create the consumer group with its stream, an existing group is kept."""
+
+        try:
+            await self.__instance.xgroup_create(stream, group, id='0', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    async def stream_add(self, stream: str, fields: dict[str, str]) -> bytes:
+        return await self.__instance.xadd(stream, fields)
+
+    async def stream_read_group(
+        self, stream: str, group: str, consumer: str, count: int, block: int
+    ) -> list[tuple[bytes, dict]]:
+        """Read the entries never delivered to the group, wait at most `block` milliseconds."""
+
+        response = await self.__instance.xreadgroup(group, consumer, {stream: '>'}, count=count, block=block)
+        return response[0][1] if response else []
+
+    async def stream_claim_idle(
+        self, stream: str, group: str, consumer: str, min_idle_time: int, count: int
+    ) -> list[tuple[bytes, dict]]:
+        """Take over the delivered entries which are not acknowledged within `min_idle_time` milliseconds."""
+
+        pending = await self.__instance.xpending_range(stream, group, '-', '+', count)
+        ids = [entry['message_id'] for entry in pending if entry['time_since_delivered'] >= min_idle_time]
+        if not ids:
+            return []
+        claimed = await self.__instance.xclaim(stream, group, consumer, min_idle_time, ids)
+        # the entries deleted from stream in between are claimed without fields
+        return [(entry_id, fields) for entry_id, fields in claimed if fields]
+
+    async def stream_delivery_count(self, stream: str, group: str, entry_id: bytes) -> int:
+        pending = await self.__instance.xpending_range(stream, group, entry_id, entry_id, 1)
+        return pending[0]['times_delivered'] if pending else 0
+
+    async def stream_ack(self, stream: str, group: str, entry_id: bytes) -> None:
+        """Acknowledge and delete the entry, so the stream only holds the unfinished ones."""
+
+        async with self.__instance.pipeline(transaction=False) as pipe:
+            pipe.xack(stream, group, entry_id)
+            pipe.xdel(stream, entry_id)
+            await pipe.execute()
+
+    async def stream_usage(self, stream: str, group: str) -> tuple[int, int, bytes | None]:
+        """Return the number of entries, the number of delivered but unacknowledged ones and the oldest id."""
+
+        async with self.__instance.pipeline(transaction=False) as pipe:
+            pipe.xlen(stream)
+            pipe.xpending(stream, group)
+            pipe.xrange(stream, count=1)
+            length, pending, oldest = await pipe.execute()
+        return length, pending['pending'], oldest[0][0] if oldest else None
+
+    async def iter_by_prefix(
+        self, prefix: str, count: int = ConfigClass.REDIS_SCAN_COUNT
+    ) -> AsyncIterator[tuple[bytes, bytes]]:
+        """Stream the key and value pairs under the prefix.
+
+        Keys are walked with cursor based SCAN and read back with one MGET
+        per batch of `count` keys, so the server is never blocked by KEYS.
+        """
+
+        async for keys in self._scan_batches(f'{prefix}:*', count):
+            values = await self.__instance.mget(keys)
+            for key, value in zip(keys, values):
+                # the key may expire between SCAN and MGET
+                if value is not None:
+                    yield key, value
+
+    async def mget_by_prefix(self, prefix: str):
+        return [value async for _, value in self.iter_by_prefix(prefix)]
+
     async def check_by_key(self, key: str):
         return await self.__instance.exists(key)
 
     async def delete_by_key(self, key: str):
         return await self.__instance.delete(key)
 
-    async def mdelete_by_prefix(self, prefix: str):
+    async def mdelete_by_prefix(self, prefix: str, count: int = ConfigClass.REDIS_SCAN_COUNT):
         logger.debug(prefix)
-        query = f'{prefix}:*'
-        keys = await self.__instance.keys(query)
-        for key in keys:
-            await self.__instance.delete(key)
+        async for keys in self._scan_batches(f'{prefix}:*', count):
+            await self.__instance.unlink(*keys)
+
+    async def _scan_batches(self, match: str, count: int) -> AsyncIterator[list[bytes]]:
+        keys = []
+        async for key in self.__instance.scan_iter(match=match, count=count):
+            keys.append(key)
+            if len(keys) >= count:
+                yield keys
+                keys = []
+        if keys:
+            yield keys
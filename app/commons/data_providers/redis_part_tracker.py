@@ -0,0 +1,129 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+
+from app.commons.data_providers.redis import SrvAioRedisSingleton
+from app.config import ConfigClass
+from app.logger import logger
+
+
+def _get_key(resumable_identifier: str) -> str:
+    return f'upload:parts:{resumable_identifier}'
+
+
+def _get_channel(resumable_identifier: str) -> str:
+    return f'upload:parts:{resumable_identifier}:uploaded'
+
+
+async def record_uploaded_part(resumable_identifier: str, part_number: int, etag: str, size: int) -> None:
+    """
+    Summary:
+        The function records the part which is uploaded into object storage
+        in the ledger of upload and notifies the finalize job waiting for
+        the parts. The ledger keeps the etag and size of each part, so the
+        parts do not have to be listed from object storage again.
+    Parameter:
+        - resumable_identifier(str): the upload id of multipart upload
+        - part_number(int): the part number of finished chunk
+        - etag(str): the etag of part returned by object storage
+        - size(int): the size of part
+    """
+
+    try:
+        await SrvAioRedisSingleton().hset_and_publish(
+            _get_key(resumable_identifier),
+            str(part_number),
+            f'{etag}:{size}',
+            _get_channel(resumable_identifier),
+            ConfigClass.PART_TRACKER_TTL,
+        )
+    except Exception:
+        logger.exception(f'Fail to record the part {part_number} of {resumable_identifier}')
+
+
+async def get_uploaded_parts(resumable_identifier: str) -> list[dict]:
+    """
+    Summary:
+        The function returns the parts recorded in the ledger of upload in
+        the same shape as the parts listed from object storage. The ledger
+        only has the parts uploaded through this service, so an empty list
+        means the caller has to list the parts from object storage.
+    Parameter:
+        - resumable_identifier(str): the upload id of multipart upload
+    Return:
+        - list: {'PartNumber': <part_number>, 'ETag': <etag>, 'Size': <size>} ordered by part number
+    """
+
+    try:
+        fields = await SrvAioRedisSingleton().get_all_fields(_get_key(resumable_identifier))
+    except Exception:
+        logger.exception(f'Fail to read the parts of {resumable_identifier}')
+        return []
+
+    parts = []
+    for part_number, content in fields.items():
+        etag, size = content.decode().rsplit(':', 1)
+        parts.append({'PartNumber': int(part_number), 'ETag': etag, 'Size': int(size)})
+
+    return sorted(parts, key=lambda x: x['PartNumber'])
+
+
+async def clear_uploaded_parts(resumable_identifier: str) -> None:
+    """Remove the ledger once the upload is completed, so it is not taken as a resumable upload."""
+
+    try:
+        await SrvAioRedisSingleton().delete_by_key(_get_key(resumable_identifier))
+    except Exception:
+        logger.exception(f'Fail to clear the parts of {resumable_identifier}')
+
+
+async def wait_for_uploaded_parts(
+    resumable_identifier: str, total_parts: int, timeout: float = ConfigClass.PART_TRACKER_WAIT_TIMEOUT
+) -> bool:
+    """
+    Summary:
+        The function waits until all the parts of upload are recorded or
+        the deadline is reached. It returns as soon as the last part is
+        announced, the set is also checked at least every second in case
+        a notification is missed. The upload whose parts are not recorded
+        at all, for example uploaded through the presigned urls, is not
+        waited for.
+    Parameter:
+        - resumable_identifier(str): the upload id of multipart upload
+        - total_parts(int): the number of parts of upload
+        - timeout(float): the seconds to wait at most
+    Return:
+        - bool: whether all the parts are recorded
+    """
+
+    redis = SrvAioRedisSingleton()
+    key = _get_key(resumable_identifier)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    try:
+        # the count is read after subscribing, so the last part cannot be missed in between
+        pubsub = await redis.subscribe(_get_channel(resumable_identifier))
+    except Exception:
+        logger.exception(f'Fail to wait for the parts of {resumable_identifier}')
+        return False
+
+    try:
+        while True:
+            count = await redis.count_fields(key)
+            if count >= total_parts:
+                return True
+            remaining = deadline - loop.time()
+            if count == 0 or remaining <= 0:
+                logger.warning(f'Only {count} of {total_parts} parts of {resumable_identifier} are recorded')
+                return False
+            await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, 1))
+    except Exception:
+        logger.exception(f'Fail to wait for the parts of {resumable_identifier}')
+        return False
+    finally:
+        await pubsub.close()
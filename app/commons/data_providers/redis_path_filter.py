@@ -0,0 +1,171 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+import hashlib
+
+from app.commons.data_providers.redis import SrvAioRedisSingleton
+from app.commons.registry import get_http_client
+from app.config import ConfigClass
+from app.logger import logger
+from app.models.models_item import ItemStatus
+
+_BUILD_LOCK_EXPIRE = 600
+_build_tasks = set()
+
+
+class ExistingPathFilter:
+    """
+    Summary:
+        The Bloom filter of the item paths which exist in one project and
+        zone. The bits are kept in a redis bitmap. A miss means the path
+        definitely does not exist, so the metadata service only has to be
+        asked about the possible hits.
+
+        The filter only knows the items which existed when it was built
+        plus the ones uploaded through this service since then, so it is
+        complete only for a short while. The ready marker expires after
+        `PATH_FILTER_TTL`, then every path is checked by the metadata
+        service until the filter is rebuilt from scratch. The items created
+        outside of upload, e.g. copied or moved by other services, are
+        missed for about `PATH_FILTER_TTL` seconds at most.
+    """
+
+    def __init__(self, project_code: str, zone: int) -> None:
+        self.project_code = project_code
+        self.zone = zone
+        self.key = f'upload:path_filter:{project_code}:{zone}'
+        self.ready_key = f'{self.key}:ready'
+        self.lock_key = f'{self.key}:building'
+        self.redis = SrvAioRedisSingleton()
+
+    @staticmethod
+    def get_offsets(path: str) -> list[int]:
+        """Map the path to the bit offsets with double hashing."""
+
+        digest = hashlib.blake2b(path.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        bits = ConfigClass.PATH_FILTER_BITS
+        return [(first + index * second) % bits for index in range(ConfigClass.PATH_FILTER_HASHES)]
+
+    async def is_ready(self) -> bool:
+        return bool(await self.redis.check_by_key(self.ready_key))
+
+    async def might_exist(self, paths: list[str]) -> list[bool] | None:
+        """
+        Summary:
+            Check which paths may exist. None is returned when the filter
+            is not built yet and every path has to be checked.
+        Parameter:
+            - paths(list): the full paths of items
+        Return:
+            - list of bool in input order or None
+        """
+
+        if not await self.is_ready():
+            return None
+
+        offsets = [self.get_offsets(path) for path in paths]
+        bits = await self.redis.getbits(self.key, [offset for path_offsets in offsets for offset in path_offsets])
+
+        hashes = ConfigClass.PATH_FILTER_HASHES
+        return [all(bits[index * hashes : (index + 1) * hashes]) for index in range(len(paths))]
+
+    async def add(self, paths: list[str]) -> None:
+        await self.redis.setbits(self.key, [offset for path in paths for offset in self.get_offsets(path)])
+
+    async def build(self) -> None:
+        """
+        Summary:
+            Clear the bitmap, add every active item of the project and zone
+            from the metadata service and mark the filter as ready. Only one
+            worker builds the filter at a time.
+        """
+
+        locked = await self.redis.mset_if_not_exists({self.lock_key: '1'}, _BUILD_LOCK_EXPIRE)
+        if not all(locked):
+            return
+
+        try:
+            # the paths uploaded meanwhile are added after the clear or listed below
+            await self.redis.delete_by_key(self.ready_key)
+            await self.redis.delete_by_key(self.key)
+
+            params = {
+                'container_code': self.project_code,
+                'status': ItemStatus.ACTIVE,
+                'zone': self.zone,
+                'recursive': True,
+                'page_size': ConfigClass.METADATA_SEARCH_PAGE_SIZE,
+            }
+            node_query_url = ConfigClass.METADATA_SERVICE + 'items/search/'
+            client = get_http_client()
+            page = 0
+            while True:
+                params['page'] = page
+                response = await client.get(node_query_url, params=params, timeout=ConfigClass.METADATA_SERVICE_TIMEOUT)
+                response.raise_for_status()
+                payload = response.json()
+                await self.add([f'{node["parent_path"]}/{node["name"]}' for node in payload.get('result', [])])
+
+                page += 1
+                if page >= payload.get('num_of_pages', 1):
+                    break
+
+            await self.redis.set_by_key(self.ready_key, '1', ConfigClass.PATH_FILTER_TTL)
+            logger.info(f'Built the path filter of {self.project_code} in zone {self.zone}')
+        except Exception:
+            logger.exception(f'Fail to build the path filter of {self.project_code} in zone {self.zone}')
+        finally:
+            await self.redis.delete_by_key(self.lock_key)
+
+    def schedule_build(self) -> None:
+        task = asyncio.create_task(self.build())
+        _build_tasks.add(task)
+        task.add_done_callback(_build_tasks.discard)
+
+
+async def filter_possible_paths(project_code: str, zone: int, paths: list[str]) -> list[bool]:
+    """
+    Summary:
+        The function tells which paths have to be checked against the
+        metadata service. When the filter is disabled or not built yet,
+        all of them have to be checked and the build is started.
+    Parameter:
+        - project_code(str): the unique code of project
+        - zone(int): 0 for greenroom and 1 for core
+        - paths(list): the full paths of items
+    Return:
+        - list of bool in input order
+    """
+
+    if not ConfigClass.PATH_FILTER_ENABLED or not paths:
+        return [True for _ in paths]
+
+    path_filter = ExistingPathFilter(project_code, zone)
+    try:
+        result = await path_filter.might_exist(paths)
+    except Exception:
+        logger.exception('Fail to read the path filter')
+        return [True for _ in paths]
+
+    if result is None:
+        path_filter.schedule_build()
+        return [True for _ in paths]
+
+    return result
+
+
+async def add_existing_paths(project_code: str, zone: int, paths: list[str]) -> None:
+    """Record the paths of newly active items in the filter if it is enabled."""
+
+    if not ConfigClass.PATH_FILTER_ENABLED or not paths:
+        return
+
+    try:
+        await ExistingPathFilter(project_code, zone).add(paths)
+    except Exception:
+        logger.exception('Fail to update the path filter')
@@ -0,0 +1,72 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+from app.commons.data_providers.redis import SrvAioRedisSingleton
+from app.config import ConfigClass
+from app.logger import logger
+from app.resources.helpers import Archive
+
+_INDEX_KEY = 'upload:archive_preview:lru'
+
+
+def _get_key(etag: str) -> str:
+    return f'upload:archive_preview:{etag}'
+
+
+async def get_cached_archive_preview(etag: str | None) -> Archive | None:
+    """
+    Summary:
+        The function returns the preview of archive with the same content.
+        The ETag of object is derived from its content, so the archive which
+        is uploaded again or copied from other project gets the same key.
+    Parameter:
+        - etag(str): the ETag of combined object
+    Return:
+        - Archive or None if the preview is not cached
+    """
+
+    if not ConfigClass.ARCHIVE_PREVIEW_CACHE_ENABLED or not etag:
+        return None
+
+    try:
+        content = await SrvAioRedisSingleton().lru_get(_INDEX_KEY, _get_key(etag))
+        if content is None:
+            return None
+        return Archive.load(content)
+    except Exception:
+        logger.exception(f'Fail to read the cached archive preview of {etag}')
+        return None
+
+
+async def cache_archive_preview(etag: str | None, archive: Archive | None) -> None:
+    """
+    Summary:
+        The function keeps the preview in the cache and evicts the least
+        recently used previews once the cache exceeds
+        `ARCHIVE_PREVIEW_CACHE_MAX_BYTES`. The preview which failed, e.g.
+        exceeded the resource limit, is not cached so the next upload of the
+        same content tries again.
+    Parameter:
+        - etag(str): the ETag of combined object
+        - archive(Archive): the preview of archive
+    """
+
+    if not ConfigClass.ARCHIVE_PREVIEW_CACHE_ENABLED or not etag or archive is None or archive.failed:
+        return
+
+    content = archive.dump()
+    if len(content) > ConfigClass.ARCHIVE_PREVIEW_CACHE_MAX_ENTRY_BYTES:
+        logger.info(f'Skip caching the archive preview of {etag} with {len(content)} bytes')
+        return
+
+    redis = SrvAioRedisSingleton()
+    try:
+        total = await redis.lru_set(_INDEX_KEY, _get_key(etag), content)
+        if total > ConfigClass.ARCHIVE_PREVIEW_CACHE_MAX_BYTES:
+            removed = await redis.lru_evict(_INDEX_KEY, ConfigClass.ARCHIVE_PREVIEW_CACHE_MAX_BYTES)
+            logger.info(f'Evicted {removed} archive previews from cache')
+    except Exception:
+        logger.exception(f'Fail to cache the archive preview of {etag}')
@@ -4,12 +4,12 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
+import asyncio
 import json
 import time
 from enum import Enum
 
-import httpx
-
+from app.commons.registry import get_http_client
 from app.config import ConfigClass
 
 _JOB_TYPE = 'data_upload'
@@ -56,10 +56,11 @@ class SessionJob:
         """Will update if exists the same key."""
         self.payload[key] = value
 
-    async def set_status(self, status: str):
-        """Set job status."""
+    async def set_status(self, status: str, save: bool = True):
+        """Set job status, the jobs written in bulk are saved later by `session_job_bulk_save`."""
         self.status = status
-        return await self.save()
+        if save:
+            return await self.save()
 
     def set_progress(self, progress: int):
         """Set job status."""
@@ -170,14 +171,47 @@ async def session_job_set_status(
         'status': str(status),
         'job_id': job_id,
     }
-    async with httpx.AsyncClient() as client:
-        res = await client.request(method='POST', url=task_url, json=payload)
-        if res.status_code != 200:
-            raise Exception(f'Failed to write job status: {res.text}')
+    client = get_http_client()
+    res = await client.request(method='POST', url=task_url, json=payload, timeout=ConfigClass.DATAOPS_SERVICE_TIMEOUT)
+    if res.status_code != 200:
+        raise Exception(f'Failed to write job status: {res.text}')
 
     return payload
 
 
+async def session_job_bulk_save(
+    jobs: list[SessionJob],
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+) -> list[dict]:
+    """
+    Summary:
+        The function will write the current status of all the jobs
+        into the task stream. The jobs are processed batch by batch
+        and the writes within a batch are sent concurrently.
+    Parameter:
+        - jobs(list[SessionJob]): the jobs with status already set
+        - batch_size(int): the number of jobs written per batch, default is `TASK_STREAM_BATCH_SIZE`
+        - concurrency(int): the maximum number of writes in flight, default is `TASK_STREAM_CONCURRENCY`
+    Return:
+        - list[dict]: the detail job info in the same order as jobs
+    """
+
+    batch_size = batch_size or ConfigClass.TASK_STREAM_BATCH_SIZE
+    semaphore = asyncio.Semaphore(concurrency or ConfigClass.TASK_STREAM_CONCURRENCY)
+
+    async def save(job: SessionJob) -> dict:
+        async with semaphore:
+            return await job.save()
+
+    results = []
+    for index in range(0, len(jobs), batch_size):
+        batch = jobs[index : index + batch_size]
+        results.extend(await asyncio.gather(*[save(job) for job in batch]))
+
+    return results
+
+
 async def session_job_get_status(
     session_id: str,
     container_code: str,
@@ -211,8 +245,8 @@ async def session_job_get_status(
         params['target_names'] = target_names
     if job_id:
         params['job_id'] = job_id
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url=task_url, params=params)
+    client = get_http_client()
+    res = await client.get(url=task_url, params=params, timeout=ConfigClass.DATAOPS_SERVICE_TIMEOUT)
 
     if res.status_code == 404:
         return []
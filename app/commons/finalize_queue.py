@@ -0,0 +1,233 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Awaitable
+from typing import Callable
+
+from app.commons.data_providers.redis import SrvAioRedisSingleton
+from app.config import ConfigClass
+from app.logger import logger
+
+FinalizeHandler = Callable[[dict], Awaitable[None]]
+
+
+class FinalizeQueueStats:
+    """Counters of the finalize jobs handled by the current process."""
+
+    def __init__(self) -> None:
+        self.enqueued = 0
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.claimed = 0
+        self.retried = 0
+        self.dead = 0
+
+    def dict(self) -> dict[str, int]:
+        return {
+            'enqueued': self.enqueued,
+            'running': self.running,
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'claimed': self.claimed,
+            'retried': self.retried,
+            'dead': self.dead,
+        }
+
+
+class FinalizeQueue:
+    """
+    Summary:
+        The durable queue of finalize jobs backed by a Redis stream. Every
+        worker process reads the jobs through the same consumer group and
+        runs at most `concurrency` of them at once, so a burst of uploads
+        is drained at a bounded rate. A job is acknowledged and deleted
+        once the handler returns. The job of a failed handler is added to
+        the stream again after `retry_delay` seconds, until it is tried
+        `max_attempts` times and moved to the dead letter stream. Only the
+        job of a worker which is gone stays pending, it is claimed again by
+        any worker after `claim_idle_time` milliseconds.
+    """
+
+    def __init__(
+        self,
+        stream: str = ConfigClass.FINALIZE_QUEUE_STREAM,
+        group: str = ConfigClass.FINALIZE_QUEUE_GROUP,
+        concurrency: int = ConfigClass.FINALIZE_QUEUE_CONCURRENCY,
+        claim_idle_time: int = ConfigClass.FINALIZE_QUEUE_CLAIM_IDLE_TIME,
+        max_attempts: int = ConfigClass.FINALIZE_QUEUE_MAX_ATTEMPTS,
+        retry_delay: float = ConfigClass.FINALIZE_QUEUE_RETRY_DELAY,
+    ) -> None:
+        self.stream = stream
+        self.group = group
+        self.dead_stream = f'{stream}:dead'
+        self.concurrency = max(concurrency, 1)
+        self.claim_idle_time = claim_idle_time
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.consumer = f'{socket.gethostname()}-{os.getpid()}'
+        self.stats = FinalizeQueueStats()
+        self._tasks = set()
+        self._retries = set()
+        self._worker = None
+
+    async def enqueue(self, job: dict) -> str:
+        """Add the job to the stream, return the id of entry."""
+
+        redis = SrvAioRedisSingleton()
+        entry_id = await redis.stream_add(self.stream, {'job': json.dumps(job)})
+        self.stats.enqueued += 1
+        return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+    async def usage(self) -> dict:
+        """
+        Summary:
+            the function reports the depth of queue and the age of the
+            oldest unfinished job next to the counters of current process.
+        Return:
+            - dict: depth, pending and oldest_age in seconds plus the counters
+        """
+
+        usage = {'depth': 0, 'pending': 0, 'oldest_age': 0.0}
+        if ConfigClass.FINALIZE_QUEUE_ENABLED:
+            try:
+                depth, pending, oldest = await SrvAioRedisSingleton().stream_usage(self.stream, self.group)
+                usage['depth'] = depth
+                usage['pending'] = pending
+                if oldest:
+                    # the stream id starts with the milliseconds when the job is added
+                    added = int(oldest.decode().split('-')[0]) / 1000
+                    usage['oldest_age'] = round(max(time.time() - added, 0), 3)
+            except Exception as e:
+                logger.error(f'Fail to read the finalize queue usage: {e}')
+
+        usage.update(self.stats.dict())
+        return usage
+
+    def start(self, handler: FinalizeHandler) -> None:
+        """Run the worker loop in background of current event loop."""
+
+        if self._worker is None:
+            self._worker = asyncio.create_task(self.run(handler))
+
+    async def stop(self) -> None:
+        """Stop reading new jobs and wait for the running ones."""
+
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        # the job waiting for retry stays pending and is claimed by another worker
+        for task in self._retries:
+            task.cancel()
+        if self._retries:
+            await asyncio.gather(*self._retries, return_exceptions=True)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def run(self, handler: FinalizeHandler) -> None:
+        """
+        Summary:
+            the worker loop. The stale jobs of other workers are claimed
+            first, then the new ones are read for the free slots.
+        Parameter:
+            - handler(FinalizeHandler): the coroutine function to run each job
+        """
+
+        redis = SrvAioRedisSingleton()
+        while True:
+            try:
+                await redis.stream_create_group(self.stream, self.group)
+                break
+            except Exception as e:
+                logger.error(f'Fail to create the finalize queue group: {e}')
+                await asyncio.sleep(ConfigClass.FINALIZE_QUEUE_RETRY_INTERVAL)
+
+        logger.info(f'Finalize queue worker {self.consumer} started with concurrency {self.concurrency}')
+        while True:
+            free = self.concurrency - len(self._tasks)
+            if free <= 0:
+                await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            try:
+                entries = await redis.stream_claim_idle(
+                    self.stream, self.group, self.consumer, self.claim_idle_time, free
+                )
+                self.stats.claimed += len(entries)
+                if not entries:
+                    entries = await redis.stream_read_group(
+                        self.stream, self.group, self.consumer, free, ConfigClass.FINALIZE_QUEUE_BLOCK_TIME
+                    )
+            except Exception as e:
+                logger.error(f'Fail to read the finalize queue: {e}')
+                await asyncio.sleep(ConfigClass.FINALIZE_QUEUE_RETRY_INTERVAL)
+                continue
+
+            for entry_id, fields in entries:
+                task = asyncio.create_task(self._process(handler, entry_id, fields))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _process(self, handler: FinalizeHandler, entry_id: bytes, fields: dict) -> None:
+        redis = SrvAioRedisSingleton()
+        self.stats.running += 1
+        try:
+            await handler(json.loads(fields[b'job']))
+        except Exception as e:
+            self.stats.failed += 1
+            logger.error(f'Finalize job {entry_id} failed: {e}')
+            await self._retire_failed(entry_id, fields)
+            return
+        finally:
+            self.stats.running -= 1
+
+        self.stats.succeeded += 1
+        try:
+            await redis.stream_ack(self.stream, self.group, entry_id)
+        except Exception as e:
+            # the job is claimed and run again, the handler sees the final status
+            logger.error(f'Fail to acknowledge finalize job {entry_id}: {e}')
+
+    async def _retire_failed(self, entry_id: bytes, fields: dict) -> None:
+        """Add the job again after the retry delay, or move it to the dead letter stream after the last attempt."""
+
+        redis = SrvAioRedisSingleton()
+        try:
+            # the delivery count also covers the claims after a worker is gone
+            attempts = int(fields.get(b'attempts', 0)) + await redis.stream_delivery_count(
+                self.stream, self.group, entry_id
+            )
+            if attempts < self.max_attempts:
+                task = asyncio.create_task(self._retry(entry_id, fields, attempts))
+                self._retries.add(task)
+                task.add_done_callback(self._retries.discard)
+                return
+            await redis.stream_add(self.dead_stream, {'job': fields[b'job'], 'entry_id': entry_id})
+            await redis.stream_ack(self.stream, self.group, entry_id)
+            self.stats.dead += 1
+            logger.error(f'Finalize job {entry_id} is moved to {self.dead_stream}')
+        except Exception as e:
+            logger.error(f'Fail to retire finalize job {entry_id}: {e}')
+
+    async def _retry(self, entry_id: bytes, fields: dict, attempts: int) -> None:
+        await asyncio.sleep(self.retry_delay)
+        redis = SrvAioRedisSingleton()
+        try:
+            # the new entry is added before the old one is acknowledged, so the job is never lost
+            await redis.stream_add(self.stream, {'job': fields[b'job'], 'attempts': attempts})
+            await redis.stream_ack(self.stream, self.group, entry_id)
+            self.stats.retried += 1
+        except Exception as e:
+            logger.error(f'Fail to retry finalize job {entry_id}: {e}')
+
+
+finalize_queue = FinalizeQueue()
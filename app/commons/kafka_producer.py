@@ -4,66 +4,267 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
+import asyncio
 import io
 import os
+import time
 from datetime import datetime
 from datetime import timezone
+from functools import partial
 
 from aiokafka import AIOKafkaProducer
 from fastavro import schema
 from fastavro import schemaless_writer
 
+from app.commons.kafka_spool import MessageSpool
+from app.commons.kafka_spool import SpoolFullError
 from app.config import ConfigClass
 from app.logger import logger
 
 
+class DeliveryStats:
+    """Counters of the messages handed to the producer and their delivery result."""
+
+    def __init__(self) -> None:
+        self.sent = 0
+        self.delivered = 0
+        self.failed = 0
+        self.pending = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.spool_bytes = 0
+
+    def dict(self) -> dict[str, int]:
+        return {
+            'sent': self.sent,
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'pending': self.pending,
+            'spooled': self.spooled,
+            'replayed': self.replayed,
+            'rejected': self.rejected,
+            'spool_bytes': self.spool_bytes,
+        }
+
+
 class KakfaProducer:
 
     producer = None
     schema_path = 'app/commons'
     connected = False
 
+    def __init__(self) -> None:
+        self.schemas = {}
+        self._buffer = io.BytesIO()
+        self.stats = DeliveryStats()
+        self._pending = set()
+        self.spool = MessageSpool(ConfigClass.KAFKA_SPOOL_DIR, ConfigClass.KAFKA_SPOOL_MAX_BYTES)
+        self._drain_task = None
+        self._reconnect_at = 0.0
+
+    def load_schemas(self) -> None:
+        """
+        Summary:
+            the function parses every avro schema under `schema_path` once,
+            so the messages are not validated against a re-read schema file.
+        """
+
+        for schema_name in os.listdir(self.schema_path):
+            if schema_name.endswith('.avsc'):
+                self.get_schema(schema_name)
+
+    def get_schema(self, schema_name: str) -> dict:
+        """
+        Summary:
+            the function returns the parsed schema from cache and loads it
+            from disk on first usage.
+
+        Parameter:
+            - schema_name(str): the file name of schema
+
+        Return:
+            - parsed schema
+        """
+
+        parsed_schema = self.schemas.get(schema_name)
+        if parsed_schema is None:
+            parsed_schema = schema.load_schema(os.path.join(self.schema_path, schema_name))
+            self.schemas[schema_name] = parsed_schema
+
+        return parsed_schema
+
     async def init_connection(self) -> None:
         """
         Summary:
-            the function for producer to connect the kafka.
+            the function for producer to connect the kafka. After a failed
+            start the connection is not retried for `KAFKA_RECONNECT_BACKOFF`
+            seconds, so the callers do not wait for the broker every time.
         """
 
-        if self.producer is None:
+        if not self.schemas:
+            self.load_schemas()
+
+        if self.producer is None and time.monotonic() >= self._reconnect_at:
             logger.info('Initializing the kafka producer')
-            self.producer = AIOKafkaProducer(bootstrap_servers=ConfigClass.KAFKA_URL)
+            producer = AIOKafkaProducer(
+                bootstrap_servers=ConfigClass.KAFKA_URL,
+                linger_ms=ConfigClass.KAFKA_LINGER_MS,
+                max_batch_size=ConfigClass.KAFKA_MAX_BATCH_SIZE,
+                compression_type=ConfigClass.KAFKA_COMPRESSION_TYPE,
+            )
             try:
-                await self.producer.start()
+                await producer.start()
+                self.producer = producer
                 self.connected = True
             except Exception as e:
                 logger.error(f'Fail to start kafka producer: {e}')
+                # the drain loop will retry with a new producer after the backoff
+                self._reconnect_at = time.monotonic() + ConfigClass.KAFKA_RECONNECT_BACKOFF
+                await self._stop_producer(producer)
+
+        if self._drain_task is None:
+            self._drain_task = asyncio.create_task(self._drain_spool())
 
         return
 
+    @staticmethod
+    async def _stop_producer(producer: AIOKafkaProducer) -> None:
+        """Release the connections and the background tasks of a producer which failed to start."""
+
+        try:
+            await producer.stop()
+        except Exception as e:
+            logger.error(f'Fail to stop kafka producer: {e}')
+
     async def close_connection(self) -> None:
         """
         Summary:
             the function for producer to close the kafka connection.
         """
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            self._drain_task = None
+
         if self.producer is not None:
             logger.info('Closing the kafka producer')
+            await self.flush()
             await self.producer.stop()
 
+    async def flush(self) -> None:
+        """
+        Summary:
+            the function sends out the batched messages and waits until
+            every pending delivery is confirmed or failed.
+        """
+
+        if self.producer is not None:
+            await self.producer.flush()
+        # a failed delivery adds the task which spools the message
+        while self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def _track(self, future: asyncio.Future) -> None:
+        self._pending.add(future)
+        self.stats.pending = len(self._pending)
+        future.add_done_callback(self._untrack)
+
+    def _untrack(self, future: asyncio.Future) -> None:
+        self._pending.discard(future)
+        self.stats.pending = len(self._pending)
+
+    def _on_delivery(self, topic: str, content: bytes, future: asyncio.Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            self.stats.failed += 1
+            error = 'cancelled' if future.cancelled() else future.exception()
+            logger.error(f'Fail to deliver message, spool it for replay: {error}')
+            self._track(asyncio.ensure_future(self._spool_failed_delivery(topic, content)))
+        else:
+            self.stats.delivered += 1
+
+    async def _spool_message(self, topic: str, content: bytes) -> None:
+        """
+        Summary:
+            the function writes the message into the local spool. It will
+            be sent by the drain loop once kafka is available again.
+        """
+
+        try:
+            await self.spool.append(topic, content)
+        except SpoolFullError:
+            self.stats.rejected += 1
+            raise
+
+        self.stats.spooled += 1
+        self.stats.spool_bytes = self.spool.size
+
+    async def _spool_failed_delivery(self, topic: str, content: bytes) -> None:
+        try:
+            await self._spool_message(topic, content)
+        except Exception:
+            logger.exception('Fail to spool the undelivered message')
+
+    async def replay_spool(self) -> None:
+        """
+        Summary:
+            the function sends the spooled messages in order and removes
+            each of them once kafka acknowledges it. The replay stops at the
+            first failure and is retried by the next drain.
+        """
+
+        for path in await self.spool.list():
+            topic, content = await self.spool.read(path)
+            await self.producer.send_and_wait(topic, content)
+            await self.spool.remove(path)
+            self.stats.replayed += 1
+            self.stats.spool_bytes = self.spool.size
+
+    async def _drain_spool(self) -> None:
+        while True:
+            await asyncio.sleep(ConfigClass.KAFKA_SPOOL_DRAIN_INTERVAL)
+            try:
+                if not self.connected:
+                    await self.init_connection()
+                if self.connected:
+                    await self.replay_spool()
+            except Exception as e:
+                logger.error(f'Fail to replay the kafka spool: {e}')
+
     async def _send_message(self, topic: str, content: bytes) -> None:
         """
         Summary:
-            the function will send the byte message to kafka topic
+            the function will send the byte message to kafka topic. By
+            default the message is only appended to the producer batch and
+            the delivery is tracked in background, unless `KAFKA_SEND_AND_WAIT`
+            is set. The message goes to the local spool when kafka is not
+            connected or fails to accept it.
 
         Parameter:
             - topic(str): the name of kafka topic
             - content(bytes): the byte message that will be sent to topic
         """
 
+        if not self.connected or self.producer is None:
+            await self._spool_message(topic, content)
+            return
+
         try:
-            await self.producer.send_and_wait(topic, content)
+            if ConfigClass.KAFKA_SEND_AND_WAIT:
+                await self.producer.send_and_wait(topic, content)
+                self.stats.sent += 1
+                self.stats.delivered += 1
+                return
+
+            future = await self.producer.send(topic, content)
         except Exception as e:
-            logger.error(f'Fail to send message: {e}')
-            raise e
+            logger.error(f'Fail to send message, spool it for replay: {e}')
+            self.stats.failed += 1
+            await self._spool_message(topic, content)
+            return
+
+        self.stats.sent += 1
+        self._track(future)
+        future.add_done_callback(partial(self._on_delivery, topic, content))
 
     async def _validate_message(self, schema_name: str, message: dict) -> bytes:
         """
@@ -79,9 +280,11 @@ class KakfaProducer:
             - byte message
         """
 
-        bio = io.BytesIO()
-        SCHEMA = schema.load_schema(os.path.join(self.schema_path, schema_name))
-        schemaless_writer(bio, SCHEMA, message)
+        # the buffer is reused since nothing awaits between write and read
+        bio = self._buffer
+        bio.seek(0)
+        bio.truncate()
+        schemaless_writer(bio, self.get_schema(schema_name), message)
 
         message = bio.getvalue()
 
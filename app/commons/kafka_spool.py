@@ -0,0 +1,140 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import os
+import time
+from uuid import uuid4
+
+from fastapi.concurrency import run_in_threadpool
+
+
+class SpoolFullError(Exception):
+    pass
+
+
+def _is_alive(name: str) -> bool:
+    """Tell whether the spool subdirectory belongs to a running process."""
+
+    if not name.isdigit():
+        return True
+    try:
+        os.kill(int(name), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+class MessageSpool:
+    """
+    Summary:
+        The write-ahead spool keeps the serialized kafka messages on local
+        disk while the broker is unavailable. Each message is one file
+        named by its spool time, so the messages are replayed in order and
+        removed one by one once they are delivered.
+
+        Every process spools into its own subdirectory named by the pid,
+        so a message is never replayed by two workers. The messages left
+        by a process which is gone are moved into the directory of the
+        next process which lists the spool.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.root = directory
+        self.directory = None
+        self.max_bytes = max_bytes
+        self.size = None
+
+    def _load(self) -> None:
+        # the pid is read on first usage since the workers may fork after import
+        self.directory = os.path.join(self.root, str(os.getpid()))
+        os.makedirs(self.directory, exist_ok=True)
+        self.size = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith('.msg'))
+
+    def _orphan_paths(self) -> list[str]:
+        """List the messages of the processes which are gone."""
+
+        paths = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and entry.path != self.directory and not _is_alive(entry.name):
+                paths.extend(os.path.join(entry.path, name) for name in os.listdir(entry.path))
+            elif entry.is_file():
+                # the messages directly under root are spooled by an older release
+                paths.append(entry.path)
+
+        return [path for path in paths if path.endswith('.msg')]
+
+    def _adopt_orphans(self) -> None:
+        orphans = self._orphan_paths()
+        for path in orphans:
+            try:
+                size = os.path.getsize(path)
+                # the rename is atomic, so only one process adopts each message
+                os.rename(path, os.path.join(self.directory, os.path.basename(path)))
+            except FileNotFoundError:
+                continue
+            self.size += size
+
+        for directory in {os.path.dirname(path) for path in orphans} - {self.root}:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+
+    def _write(self, topic: str, content: bytes) -> int:
+        if self.size is None:
+            self._load()
+
+        record = topic.encode() + b'\n' + content
+        if self.size + len(record) > self.max_bytes:
+            raise SpoolFullError(f'The spool {self.directory} exceeds {self.max_bytes} bytes')
+
+        name = f'{time.time_ns():020d}-{uuid4().hex}'
+        temp_path = os.path.join(self.directory, name + '.tmp')
+        with open(temp_path, 'wb') as file:
+            file.write(record)
+            file.flush()
+            os.fsync(file.fileno())
+        # the rename makes the message visible only once it is fully written
+        os.rename(temp_path, os.path.join(self.directory, name + '.msg'))
+        self.size += len(record)
+
+        return len(record)
+
+    def _list(self) -> list[str]:
+        if self.size is None:
+            self._load()
+        self._adopt_orphans()
+
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.msg'))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _read(self, path: str) -> tuple[str, bytes]:
+        with open(path, 'rb') as file:
+            topic, content = file.read().split(b'\n', 1)
+
+        return topic.decode(), content
+
+    def _remove(self, path: str) -> None:
+        size = os.path.getsize(path)
+        os.remove(path)
+        self.size -= size
+
+    async def append(self, topic: str, content: bytes) -> int:
+        """Write the message into spool and return the number of spooled bytes."""
+
+        return await run_in_threadpool(self._write, topic, content)
+
+    async def list(self) -> list[str]:
+        return await run_in_threadpool(self._list)
+
+    async def read(self, path: str) -> tuple[str, bytes]:
+        return await run_in_threadpool(self._read, path)
+
+    async def remove(self, path: str) -> None:
+        await run_in_threadpool(self._remove, path)
@@ -0,0 +1,373 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+import io
+import re
+from collections import OrderedDict
+from typing import AsyncIterator
+
+import httpx
+from common.object_storage_adaptor.boto3_client import Boto3Client
+from fastapi import UploadFile
+
+from app.commons.object_storage_client import ObjectStorageClient
+from app.commons.registry import get_object_storage_http_client
+from app.config import ConfigClass
+from app.logger import logger
+
+
+class PartStreamStats:
+    """Aggregated memory usage of the parts which are currently streamed to object storage."""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.buffered_bytes = 0
+        self.peak_buffered_bytes = 0
+        self.peak_part_buffer_bytes = 0
+
+    def dict(self) -> dict[str, int]:
+        return {
+            'in_flight': self.in_flight,
+            'buffered_bytes': self.buffered_bytes,
+            'peak_buffered_bytes': self.peak_buffered_bytes,
+            'peak_part_buffer_bytes': self.peak_part_buffer_bytes,
+        }
+
+
+part_stream_stats = PartStreamStats()
+
+
+class BoundedPartStream:
+    """
+    Summary:
+        The async iterator regroups the incoming body pieces into blocks
+        of `block_size` bytes, so only one block of each part is kept in
+        memory while it is forwarded to object storage.
+    """
+
+    def __init__(self, source: AsyncIterator[bytes], block_size: int) -> None:
+        self.source = source
+        self.block_size = block_size
+        self.sent_bytes = 0
+        self.peak_buffer_bytes = 0
+        self._buffered = 0
+
+    def _track(self, size: int) -> None:
+        part_stream_stats.buffered_bytes += size - self._buffered
+        part_stream_stats.peak_buffered_bytes = max(
+            part_stream_stats.peak_buffered_bytes, part_stream_stats.buffered_bytes
+        )
+        self._buffered = size
+        self.peak_buffer_bytes = max(self.peak_buffer_bytes, size)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        buffer = bytearray()
+        try:
+            async for piece in self.source:
+                buffer += piece
+                self._track(len(buffer))
+                if len(buffer) >= self.block_size:
+                    block = bytes(buffer)
+                    buffer.clear()
+                    self.sent_bytes += len(block)
+                    yield block
+                    self._track(0)
+
+            if buffer:
+                self.sent_bytes += len(buffer)
+                yield bytes(buffer)
+        finally:
+            self._track(0)
+
+
+async def iter_upload_file(upload_file: UploadFile, block_size: int) -> AsyncIterator[bytes]:
+    """Read the spooled multipart file block by block."""
+
+    while True:
+        block = await upload_file.read(block_size)
+        if not block:
+            break
+        yield block
+
+
+def get_upload_file_size(upload_file: UploadFile) -> int:
+    """Get the size of the spooled multipart file without reading it."""
+
+    upload_file.file.seek(0, 2)
+    size = upload_file.file.tell()
+    upload_file.file.seek(0)
+    return size
+
+
+async def stream_part_upload(
+    boto3_client: Boto3Client,
+    bucket: str,
+    key: str,
+    upload_id: str,
+    part_number: int,
+    source: AsyncIterator[bytes],
+    content_length: int,
+) -> dict:
+    """
+    Summary:
+        The function uploads a SINGLE part of multipart upload. Unlike the
+        `Boto3Client.part_upload` the content is streamed through a bounded
+        buffer instead of being loaded into memory first.
+    Parameter:
+        - boto3_client(Boto3Client): the client of internal object storage
+        - bucket(str): the bucket name
+        - key(str): the object path of file
+        - upload_id(str): the hash id generate from `prepare_multipart_upload` function
+        - part_number(int): the part number of current chunk (which starts from 1)
+        - source(AsyncIterator[bytes]): the part content
+        - content_length(int): the size of part content
+    Return:
+        - dict: {'ETag': <etag>, 'PartNumber': <part_number>}
+    """
+
+    presigned_url = await boto3_client.generate_presigned_url(bucket, key, upload_id, part_number)
+    stream = BoundedPartStream(source, ConfigClass.CHUNK_STREAM_BLOCK_SIZE)
+
+    part_stream_stats.in_flight += 1
+    try:
+        client = get_object_storage_http_client()
+        response = await client.put(
+            presigned_url,
+            content=stream,
+            headers={'Content-Length': str(content_length)},
+            timeout=ConfigClass.S3_PART_UPLOAD_TIMEOUT,
+        )
+    finally:
+        part_stream_stats.in_flight -= 1
+        part_stream_stats.peak_part_buffer_bytes = max(
+            part_stream_stats.peak_part_buffer_bytes, stream.peak_buffer_bytes
+        )
+
+    logger.info(
+        f'Part {part_number} streamed {stream.sent_bytes} bytes with peak buffer of {stream.peak_buffer_bytes} bytes'
+    )
+
+    if response.status_code != 200:
+        raise Exception(f'Fail to upload the chunk {part_number}: {response.text}')
+
+    etag = response.headers.get('ETag')
+    if not etag:
+        raise Exception(f'Fail to upload the chunk {part_number}: the response has no ETag')
+    etag = etag.replace("\"", '')
+
+    return {'ETag': etag, 'PartNumber': part_number}
+
+
+async def list_all_parts(
+    boto3_client: ObjectStorageClient, bucket: str, key: str, upload_id: str, expected_parts: int | None = None
+) -> list[dict]:
+    """
+    Summary:
+        The function lists ALL the uploaded parts of multipart upload. The
+        object storage returns at most one page of `S3_LIST_PARTS_PAGE_SIZE`
+        parts per call, so the pages are followed through the part number
+        marker. When the expected number of parts is known, the following
+        pages are fetched concurrently.
+    Parameter:
+        - boto3_client(ObjectStorageClient): the client of internal object storage
+        - bucket(str): the bucket name
+        - key(str): the object path of file
+        - upload_id(str): the hash id generate from `prepare_multipart_upload` function
+        - expected_parts(int): the number of parts the upload should have
+    Return:
+        - list: the parts ordered by part number
+    """
+
+    page_size = ConfigClass.S3_LIST_PARTS_PAGE_SIZE
+    semaphore = asyncio.Semaphore(ConfigClass.S3_LIST_PARTS_CONCURRENCY)
+    parts = {}
+
+    async def list_page(marker: int) -> dict:
+        async with semaphore:
+            page = await boto3_client.list_parts(bucket, key, upload_id, page_size, marker)
+        for part in page.get('Parts', []):
+            parts[part['PartNumber']] = part
+        return page
+
+    page = await list_page(0)
+    if page.get('IsTruncated') and expected_parts:
+        # a page after marker m holds every part numbered up to m + page_size
+        markers = range(int(page['NextPartNumberMarker']), expected_parts, page_size)
+        pages = await asyncio.gather(*[list_page(marker) for marker in markers])
+        page = pages[-1] if pages else page
+
+    while page.get('IsTruncated'):
+        page = await list_page(int(page['NextPartNumberMarker']))
+
+    logger.info(f'Listed {len(parts)} parts for {bucket}/{key} with id {upload_id}')
+
+    return [parts[part_number] for part_number in sorted(parts)]
+
+
+class RangedObjectReader(io.RawIOBase):
+    """
+    Summary:
+        The seekable read only file object over a presigned GET url. The
+        content is fetched with HTTP Range requests in blocks of
+        `block_size` bytes, `read_ahead` blocks per request, and the recent
+        blocks are kept in a LRU cache. The archive readers can open it
+        directly, so only the parts of object they seek to are transferred.
+
+        The reader can be pickled with its cached blocks, so the blocks
+        which are already read are not fetched again on the other side.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        name: str = '',
+        size: int | None = None,
+        block_size: int = ConfigClass.ARCHIVE_READ_BLOCK_SIZE,
+        read_ahead: int = ConfigClass.ARCHIVE_READ_AHEAD_BLOCKS,
+        cache_blocks: int = ConfigClass.ARCHIVE_READ_CACHE_BLOCKS,
+    ) -> None:
+        super().__init__()
+        self.url = url
+        self.name = name
+        self._size = size
+        self.block_size = block_size
+        self.read_ahead = max(read_ahead, 1)
+        self.cache_blocks = max(cache_blocks, self.read_ahead)
+        self.position = 0
+        self.requests = 0
+        self.fetched_bytes = 0
+        self._blocks = OrderedDict()
+        self._extents = []
+        self._client = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_client'] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        super().__init__()
+        self.__dict__.update(state)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            # the first request also tells the object size through Content-Range
+            self._fetch(0)
+        return self._size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f'Invalid whence {whence}')
+
+        if position < 0:
+            raise ValueError(f'Negative seek position {position}')
+
+        self.position = position
+        return self.position
+
+    def preload(self, offset: int, content: bytes) -> None:
+        """Serve the given bytes at the offset without any request."""
+
+        if content:
+            self._extents.append((offset, bytes(content)))
+
+    def _read_extent(self, length: int) -> bytes:
+        for offset, content in self._extents:
+            if offset <= self.position < offset + len(content):
+                start = self.position - offset
+                return content[start : start + length]
+
+        return b''
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        end = min(self.position + len(view), self.size)
+        written = 0
+        while self.position < end:
+            chunk = self._read_extent(end - self.position)
+            if not chunk:
+                index, offset = divmod(self.position, self.block_size)
+                block = self._get_block(index)
+                chunk = block[offset : offset + end - self.position]
+            if not chunk:
+                break
+            view[written : written + len(chunk)] = chunk
+            written += len(chunk)
+            self.position += len(chunk)
+
+        return written
+
+    def add_block(self, index: int, block: bytes) -> None:
+        """Put the block into the cache, the least recently used one is evicted."""
+
+        self._blocks[index] = block
+        self._blocks.move_to_end(index)
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+
+    def _get_block(self, index: int) -> bytes:
+        block = self._blocks.get(index)
+        if block is None:
+            self._fetch(index)
+            block = self._blocks.get(index, b'')
+        else:
+            self._blocks.move_to_end(index)
+
+        return block
+
+    def _fetch(self, index: int) -> None:
+        if self._client is None:
+            self._client = httpx.Client(timeout=ConfigClass.ARCHIVE_READ_TIMEOUT)
+
+        start = index * self.block_size
+        end = start + self.block_size * self.read_ahead - 1
+        if self._size is not None:
+            end = min(end, self._size - 1)
+            if start > end:
+                return
+
+        response = self._client.get(self.url, headers={'Range': f'bytes={start}-{end}'})
+        if response.status_code == 416:
+            self._size = self._size if self._size is not None else 0
+            return
+        response.raise_for_status()
+
+        content = response.content
+        self.requests += 1
+        self.fetched_bytes += len(content)
+
+        if self._size is None:
+            content_range = re.match(r'bytes \d+-\d+/(\d+)', response.headers.get('Content-Range', ''))
+            self._size = int(content_range.group(1)) if content_range else len(content)
+        if response.status_code == 200:
+            # the server ignored the range and answered with whole object
+            content = content[start : end + 1]
+
+        for offset in range(0, len(content), self.block_size):
+            self.add_block(index + offset // self.block_size, content[offset : offset + self.block_size])
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        super().close()
@@ -0,0 +1,69 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+from common.object_storage_adaptor.boto3_client import Boto3Client
+
+
+class ObjectStorageClient(Boto3Client):
+    """
+    Summary:
+        The object storage client with the operations the common
+        `Boto3Client` does not provide, including:
+            - list one page of uploaded parts
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        access_key: str = None,
+        secret_key: str = None,
+        https: bool = False,
+        max_pool_connections: int | None = None,
+    ) -> None:
+        super().__init__(endpoint, access_key=access_key, secret_key=secret_key, https=https)
+        if max_pool_connections:
+            self._config.max_pool_connections = max_pool_connections
+
+    async def list_parts(self, bucket: str, key: str, upload_id: str, max_parts: int, part_number_marker: int) -> dict:
+        """
+        Summary:
+            The function is the boto3 wrapup to list one page of uploaded
+            parts after the part number marker.
+        Parameter:
+            - bucket(str): the bucket name
+            - key(str): the object path of file
+            - upload_id(str): the hash id generate from `prepare_multipart_upload` function
+            - max_parts(int): the maximum number of parts in the page
+            - part_number_marker(int): the part number after which the page starts
+        Return:
+            - dict: the ListParts response with `Parts`, `IsTruncated` and `NextPartNumberMarker`
+        """
+
+        async with self._session.client('s3', endpoint_url=self.endpoint, config=self._config) as s3:
+            return await s3.list_parts(
+                Bucket=bucket, Key=key, UploadId=upload_id, MaxParts=max_parts, PartNumberMarker=part_number_marker
+            )
+
+
+async def get_object_storage_client(
+    endpoint: str,
+    access_key: str = None,
+    secret_key: str = None,
+    https: bool = False,
+    max_pool_connections: int | None = None,
+) -> ObjectStorageClient:
+    """Create the object storage client and connect it."""
+
+    client = ObjectStorageClient(
+        endpoint,
+        access_key=access_key,
+        secret_key=secret_key,
+        https=https,
+        max_pool_connections=max_pool_connections,
+    )
+    await client.init_connection()
+
+    return client
@@ -0,0 +1,260 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import weakref
+
+import httpx
+from common import ProjectClient
+from common.object_storage_adaptor.boto3_client import Boto3Client
+from common.object_storage_adaptor.boto3_client import get_boto3_client
+
+from app.commons.data_providers.redis import SrvAioRedisSingleton
+from app.commons.kafka_producer import KakfaProducer
+from app.commons.kafka_producer import get_kafka_producer
+from app.commons.object_storage_client import ObjectStorageClient
+from app.commons.object_storage_client import get_object_storage_client
+from app.config import ConfigClass
+from app.logger import logger
+
+
+class HttpClientUsage:
+    """
+    Summary:
+        The counters of requests sent through a http client. They are
+        updated by the event hooks of client, so the connection pool
+        internals of httpx are not touched. A request which fails before
+        its response leaves the in flight set once it is released.
+    """
+
+    def __init__(self, max_connections: int) -> None:
+        self.max_connections = max_connections
+        self.requests = 0
+        self.responses = 0
+        self._in_flight = weakref.WeakSet()
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        self._in_flight.add(request)
+
+    async def on_response(self, response: httpx.Response) -> None:
+        self.responses += 1
+        self._in_flight.discard(response.request)
+
+    def dict(self) -> dict[str, int]:
+        return {
+            'max_connections': self.max_connections,
+            'in_flight': len(self._in_flight),
+            'requests': self.requests,
+            'responses': self.responses,
+        }
+
+
+def create_http_client(
+    max_connections: int, max_keepalive_connections: int
+) -> tuple[httpx.AsyncClient, HttpClientUsage]:
+    """Create the pooled http client with the hooks counting its usage."""
+
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=ConfigClass.HTTP_KEEPALIVE_EXPIRY,
+    )
+    usage = HttpClientUsage(max_connections)
+    client = httpx.AsyncClient(
+        limits=limits, event_hooks={'request': [usage.on_request], 'response': [usage.on_response]}
+    )
+
+    return client, usage
+
+
+class ClientRegistry:
+    """
+    Summary:
+        The registry keeps the downstream clients that are shared by every
+        request handled by the worker process. The clients are created once
+        during the application startup instead of per request.
+    """
+
+    boto3_client: ObjectStorageClient = None
+    boto3_client_public: Boto3Client = None
+    project_client: ProjectClient = None
+    redis: SrvAioRedisSingleton = None
+    kafka_producer: KakfaProducer = None
+    http_client: httpx.AsyncClient = None
+    http_usage: HttpClientUsage = None
+    object_storage_http_client: httpx.AsyncClient = None
+    object_storage_http_usage: HttpClientUsage = None
+    initialized = False
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        """
+        Summary:
+            the function returns the pooled http client used for all the
+            downstream service calls. The client is created on first usage.
+        """
+
+        if self.http_client is None:
+            logger.info('Initialize the shared http client')
+            self.http_client, self.http_usage = create_http_client(
+                ConfigClass.HTTP_MAX_CONNECTIONS, ConfigClass.HTTP_MAX_KEEPALIVE_CONNECTIONS
+            )
+
+        return self.http_client
+
+    def get_object_storage_http_client(self) -> httpx.AsyncClient:
+        """
+        Summary:
+            the function returns the http client which streams the chunk
+            parts to object storage. The part uploads hold their connection
+            for a long time, so they have their own pool and do not block
+            the downstream service calls.
+        """
+
+        if self.object_storage_http_client is None:
+            logger.info('Initialize the object storage http client')
+            self.object_storage_http_client, self.object_storage_http_usage = create_http_client(
+                ConfigClass.S3_HTTP_MAX_CONNECTIONS, ConfigClass.S3_HTTP_MAX_KEEPALIVE_CONNECTIONS
+            )
+
+        return self.object_storage_http_client
+
+    def get_http_pool_usage(self) -> dict[str, int]:
+        """
+        Summary:
+            the function reports the usage of the shared http client.
+
+        Return:
+            - dict: the connection limit, the requests waiting for their
+                response and the number of requests and responses
+        """
+
+        if self.http_usage is None:
+            return HttpClientUsage(ConfigClass.HTTP_MAX_CONNECTIONS).dict()
+
+        return self.http_usage.dict()
+
+    def get_object_storage_pool_usage(self) -> dict[str, int]:
+        """Report the usage of the http client which streams the chunk parts."""
+
+        if self.object_storage_http_usage is None:
+            return HttpClientUsage(ConfigClass.S3_HTTP_MAX_CONNECTIONS).dict()
+
+        return self.object_storage_http_usage.dict()
+
+    async def init_connection(self) -> None:
+        """
+        Summary:
+            the function will create the object storage, project and redis
+            clients if they are not created yet.
+        """
+
+        if self.initialized:
+            return
+
+        logger.info('Initialize the client registry')
+        try:
+            boto3_client = await get_object_storage_client(
+                ConfigClass.S3_INTERNAL,
+                access_key=ConfigClass.S3_ACCESS_KEY,
+                secret_key=ConfigClass.S3_SECRET_KEY,
+                https=ConfigClass.S3_INTERNAL_HTTPS,
+                max_pool_connections=ConfigClass.S3_MAX_POOL_CONNECTIONS,
+            )
+
+            boto3_client_public = await get_boto3_client(
+                ConfigClass.S3_PUBLIC,
+                access_key=ConfigClass.S3_ACCESS_KEY,
+                secret_key=ConfigClass.S3_SECRET_KEY,
+                https=ConfigClass.S3_PUBLIC_HTTPS,
+            )
+        except Exception:
+            logger.exception('Fail to create connection with boto3')
+            raise
+
+        self.boto3_client = boto3_client
+        self.boto3_client_public = boto3_client_public
+        self.project_client = ProjectClient(ConfigClass.PROJECT_SERVICE, ConfigClass.REDIS_URL)
+        self.redis = SrvAioRedisSingleton()
+        self.get_http_client()
+        self.initialized = True
+
+    async def connect_kafka(self) -> None:
+        """
+        Summary:
+            the function will start the kafka producer. It is separated from
+            `init_connection` since it requires a live connection to broker.
+        """
+
+        self.kafka_producer = await get_kafka_producer()
+
+    async def close_connection(self) -> None:
+        """
+        Summary:
+            the function will gracefully close the clients which hold
+            the connections.
+        """
+
+        if self.kafka_producer is not None:
+            await self.kafka_producer.close_connection()
+
+        if self.http_client is not None:
+            await self.http_client.aclose()
+            self.http_client = None
+
+        if self.object_storage_http_client is not None:
+            await self.object_storage_http_client.aclose()
+            self.object_storage_http_client = None
+
+
+client_registry = ClientRegistry()
+
+
+async def get_client_registry() -> ClientRegistry:
+    """
+    Summary:
+        the function will initialize the registry if the function
+        is called for first time
+
+    Return:
+        - ClientRegistry: the global variable
+    """
+
+    await client_registry.init_connection()
+
+    return client_registry
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the pooled http client shared by the downstream service calls."""
+
+    return client_registry.get_http_client()
+
+
+def get_object_storage_http_client() -> httpx.AsyncClient:
+    """Get the pooled http client which streams the chunk parts to object storage."""
+
+    return client_registry.get_object_storage_http_client()
+
+
+async def get_internal_boto3_client() -> ObjectStorageClient:
+    """Get the boto3 client connected to the internal object storage endpoint."""
+
+    registry = await get_client_registry()
+    return registry.boto3_client
+
+
+async def get_public_boto3_client() -> Boto3Client:
+    """Get the boto3 client connected to the public object storage endpoint."""
+
+    registry = await get_client_registry()
+    return registry.boto3_client_public
+
+
+async def get_project_client() -> ProjectClient:
+    """Get the shared project service client."""
+
+    registry = await get_client_registry()
+    return registry.project_client
@@ -34,6 +34,17 @@ class Settings(BaseSettings):
     DATAOPS_SERVICE: str
     METADATA_SERVICE: str
     PROJECT_SERVICE: str
+    DATAOPS_SERVICE_TIMEOUT: float = 5
+    METADATA_SERVICE_TIMEOUT: float = 10
+    TASK_STREAM_BATCH_SIZE: int = 500
+    TASK_STREAM_CONCURRENCY: int = 20
+    METADATA_SEARCH_PAGE_SIZE: int = 1000
+    METADATA_SEARCH_CONCURRENCY: int = 10
+
+    # shared http client
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30
 
     # minio
     S3_INTERNAL: str
@@ -42,6 +53,29 @@ class Settings(BaseSettings):
     S3_PUBLIC_HTTPS: bool = True
     S3_ACCESS_KEY: str
     S3_SECRET_KEY: str
+    S3_MAX_POOL_CONNECTIONS: int = 1000
+    S3_PART_UPLOAD_TIMEOUT: float = 60
+    S3_HTTP_MAX_CONNECTIONS: int = 50
+    S3_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    CHUNK_STREAM_BLOCK_SIZE: int = 256 * 1024
+    RESUMABLE_LIST_CONCURRENCY: int = 50
+    S3_LIST_PARTS_PAGE_SIZE: int = 1000
+    S3_LIST_PARTS_CONCURRENCY: int = 8
+    ARCHIVE_READ_BLOCK_SIZE: int = 1024 * 1024
+    ARCHIVE_READ_AHEAD_BLOCKS: int = 4
+    ARCHIVE_READ_CACHE_BLOCKS: int = 64
+    ARCHIVE_READ_TIMEOUT: float = 60
+    ARCHIVE_INDEX_CAPTURE_ENABLED: bool = False
+    ARCHIVE_INDEX_CAPTURE_SIZE: int = 256 * 1024
+    ARCHIVE_INDEX_CAPTURE_TTL: int = 86400
+    ARCHIVE_PREVIEW_WORKERS: int = 2
+    ARCHIVE_PREVIEW_TIMEOUT: int = 300
+    ARCHIVE_PREVIEW_MEMORY_LIMIT: int = 1024 * 1024 * 1024
+    ARCHIVE_PREVIEW_MAX_ENTRIES: int = 100000
+    ARCHIVE_PREVIEW_STREAM_CHUNK_SIZE: int = 64 * 1024
+    ARCHIVE_PREVIEW_CACHE_ENABLED: bool = True
+    ARCHIVE_PREVIEW_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    ARCHIVE_PREVIEW_CACHE_MAX_ENTRY_BYTES: int = 4 * 1024 * 1024
 
     # Redis Service
     REDIS_HOST: str
@@ -49,10 +83,36 @@ class Settings(BaseSettings):
     REDIS_DB: int
     REDIS_USER: str = 'default'
     REDIS_PASSWORD: str
+    REDIS_SCAN_COUNT: int = 1000
+    PATH_FILTER_ENABLED: bool = False
+    PATH_FILTER_BITS: int = 8 * 1024 * 1024
+    PATH_FILTER_HASHES: int = 7
+    PATH_FILTER_TTL: int = 300
+    PART_TRACKER_TTL: int = 86400
+    PART_TRACKER_WAIT_TIMEOUT: float = 30
+    PART_LIST_ATTEMPTS: int = 3
+    PART_LEDGER_VERIFY_RATE: float = 0.0
+    FINALIZE_QUEUE_ENABLED: bool = False
+    FINALIZE_QUEUE_API_CONSUMER: bool = True
+    FINALIZE_QUEUE_STREAM: str = 'upload:finalize'
+    FINALIZE_QUEUE_GROUP: str = 'finalize'
+    FINALIZE_QUEUE_CONCURRENCY: int = 4
+    FINALIZE_QUEUE_CLAIM_IDLE_TIME: int = 30 * 60 * 1000
+    FINALIZE_QUEUE_MAX_ATTEMPTS: int = 3
+    FINALIZE_QUEUE_BLOCK_TIME: int = 5000
+    FINALIZE_QUEUE_RETRY_INTERVAL: float = 5
+    FINALIZE_QUEUE_RETRY_DELAY: float = 10
 
     # Kafka info
     KAFKA_URL: str
     KAFKA_ACTIVITY_TOPIC: str = 'metadata.items.activity'
+    KAFKA_LINGER_MS: int = 50
+    KAFKA_MAX_BATCH_SIZE: int = 64 * 1024
+    KAFKA_COMPRESSION_TYPE: str | None = 'gzip'
+    KAFKA_SEND_AND_WAIT: bool = False
+    KAFKA_SPOOL_MAX_BYTES: int = 512 * 1024 * 1024
+    KAFKA_SPOOL_DRAIN_INTERVAL: float = 10
+    KAFKA_RECONNECT_BACKOFF: float = 30
 
     OPEN_TELEMETRY_ENABLED: bool = False
     OPEN_TELEMETRY_HOST: str = '127.0.0.1'
@@ -75,6 +135,7 @@ class Settings(BaseSettings):
 
         # temp path mount
         self.TEMP_BASE = self.ROOT_PATH + '/tmp/upload'
+        self.KAFKA_SPOOL_DIR = self.ROOT_PATH + '/tmp/kafka_spool'
 
         # redis
         self.REDIS_URL = (
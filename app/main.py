@@ -20,9 +20,13 @@ from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 
 from app.api_registry import api_registry
+from app.commons.finalize_queue import finalize_queue
+from app.commons.registry import client_registry
 from app.config import ConfigClass
 from app.config import Settings
+from app.resources.preview_pool import preview_pool
 from app.routers.exceptions import ServiceException
+from app.routers.v1.api_data_upload import run_finalize_job
 
 
 def create_app():
@@ -47,6 +51,7 @@ def create_app():
 
     api_registry(app)
     setup_exception_handlers(app)
+    setup_client_registry(app)
 
     instrument_app(app)
 
@@ -59,6 +64,24 @@ def setup_logging(settings: Settings) -> None:
     configure_logging(settings.LOGGING_LEVEL, settings.LOGGING_FORMAT)
 
 
+def setup_client_registry(app: FastAPI) -> None:
+    """Create the shared downstream clients and finalize workers on startup and close them on shutdown."""
+
+    async def startup_event() -> None:
+        await client_registry.init_connection()
+        await client_registry.connect_kafka()
+        if ConfigClass.FINALIZE_QUEUE_ENABLED and ConfigClass.FINALIZE_QUEUE_API_CONSUMER:
+            finalize_queue.start(run_finalize_job)
+
+    async def shutdown_event() -> None:
+        await finalize_queue.stop()
+        await client_registry.close_connection()
+        preview_pool.shutdown()
+
+    app.add_event_handler('startup', startup_event)
+    app.add_event_handler('shutdown', shutdown_event)
+
+
 def setup_exception_handlers(app: FastAPI) -> None:
     """Configure the application exception handlers."""
 
@@ -18,69 +18,122 @@ from app.routers.v1.exceptions import InvalidPayload
 redis_srv = SrvAioRedisSingleton()
 
 
+class FolderTrieNode:
+    """Node of the folder trie built from the file paths of an upload batch."""
+
+    def __init__(self) -> None:
+        self.children: dict[str, FolderTrieNode] = {}
+        self.folder: FolderNode | None = None
+
+    def insert(self, folder_names: list[str]) -> 'FolderTrieNode':
+        """Add the chain of folder names and return the last trie node."""
+
+        node = self
+        for folder_name in folder_names:
+            node = node.children.setdefault(folder_name, FolderTrieNode())
+        return node
+
+
 class FolderMgr:
-    """Folder Manager."""
+    """Folder Manager.
 
-    def __init__(self, project_code, relative_path):
+    The manager plans the folder tree for ALL the files of a pre-upload batch.
+    File paths are merged into a trie, so every distinct folder is resolved
+    exactly once no matter how many files share it.
+    """
+
+    def __init__(self, project_code, current_folder, parent_folder_id):
         self.project_code = project_code
-        self.relative_path = relative_path
-        self.last_node = None
+        self.current_folder = current_folder
+        self.parent_folder_id = parent_folder_id
         self.to_create = []
-        self.relations_data = []
         self.zone = ConfigClass.namespace
 
-    async def create(self, creator: str, current_folder: str, parent_folder_id: str):
-        """Create folder nodes and connect them to the parent."""
-        try:
-            #
-            to_create_path = (self.relative_path + '/').replace(current_folder + '/', '')
-            to_create_path = to_create_path.split('/')[:-1]
-            node_chain = []
-            read_db_duration = 0
+    def _split_path(self, relative_path: str) -> list[str]:
+        """Get the folder names to create under the current folder node."""
+
+        to_create_path = (relative_path + '/').replace(self.current_folder + '/', '')
+        return to_create_path.split('/')[:-1]
+
+    async def create(self, creator: str, relative_paths: list[str]) -> list[str]:
+        """Create folder nodes for all the paths and connect them to the parent.
+
+        The cached nodes of the whole tree are read with one MGET and the new
+        nodes are written with one pipeline of `SET NX`. If another upload
+        registers the same folder in between, its node wins and is reused.
+
+        Return the id of the last folder node of each relative path.
+        """
 
-            if len(current_folder.rsplit('/')) < 2:
-                raise InvalidPayload('Cannot create folder directly under project node')
-            current_folder_path, current_folder_name = current_folder.rsplit('/', 1)
-            current_folder_node = await get_folder_node(
-                self.project_code, current_folder_name, current_folder_path, creator, self.zone
-            )
-            current_folder_node.folder_parent_geid = parent_folder_id
+        if len(self.current_folder.rsplit('/')) < 2:
+            raise InvalidPayload('Cannot create folder directly under project node')
 
-            if current_folder_node.exist is False:
-                lazy_save = await current_folder_node.lazy_save()
-                self.to_create.append(lazy_save)
-            node_chain.append(current_folder_node)
-            self.last_node = current_folder_node
+        root = FolderTrieNode()
+        leaves = [root.insert(self._split_path(relative_path)) for relative_path in relative_paths]
 
-            for folder_name in to_create_path:
-                parent_node = self.last_node
-                folder_relative_path = os.path.join(parent_node.folder_relative_path, parent_node.folder_name)
-                read_db_start_time = time.time()
+        read_db_start_time = time.time()
+        current_folder_path, current_folder_name = self.current_folder.rsplit('/', 1)
+        root.folder = FolderNode(self.project_code, current_folder_name, current_folder_path, creator, self.zone)
 
-                new_node = await get_folder_node(
-                    self.project_code, folder_name, folder_relative_path, creator, self.zone
-                )
+        # parents always come before their children in the breadth first order
+        nodes = [root]
+        for trie_node in nodes:
+            parent_node = trie_node.folder
+            folder_relative_path = os.path.join(parent_node.folder_relative_path, parent_node.folder_name)
+            for folder_name, child in trie_node.children.items():
+                child.folder = FolderNode(self.project_code, folder_name, folder_relative_path, creator, self.zone)
+                nodes.append(child)
 
-                if not new_node.exist:
-                    new_node.folder_parent_geid = parent_node.global_entity_id
-                    lazy_save = await new_node.lazy_save()
-                    self.to_create.append(lazy_save)
+        folders = [trie_node.folder for trie_node in nodes]
+        cached = await redis_srv.mget_by_keys([folder.cache_key for folder in folders])
+        for folder, found in zip(folders, cached):
+            if found:
+                folder.load_from_cache(found)
 
-                read_db_duration += time.time() - read_db_start_time
+        self._link_parents(nodes)
+        new_folders = [folder for folder in folders if not folder.exist]
+        written = await redis_srv.mset_if_not_exists({folder.cache_key: folder.dump() for folder in new_folders})
 
-                node_chain.append(new_node)
-                self.last_node = new_node
+        lost_folders = [folder for folder, is_written in zip(new_folders, written) if not is_written]
+        if lost_folders:
+            await self._reuse_lost_folders(nodes, lost_folders)
 
-            logger.info(f'Read From db cost {read_db_duration}')
+        logger.info(f'Read From db cost {time.time() - read_db_start_time}')
 
-        except Exception:
-            raise
+        for folder in folders:
+            if not folder.exist:
+                self.to_create.append(await folder.lazy_save())
 
+        return [leaf.folder.global_entity_id for leaf in leaves]
 
-async def get_folder_node(project_code, folder_name, folder_relative_path, creator, zone):
-    folder_node = FolderNode(project_code, folder_name, folder_relative_path, creator, zone)
-    await folder_node.read_node()
-    return folder_node
+    async def _reuse_lost_folders(self, nodes: list[FolderTrieNode], lost_folders: list['FolderNode']) -> None:
+        """Load the nodes registered by another upload in between and relink the new children to them."""
+
+        cached = await redis_srv.mget_by_keys([folder.cache_key for folder in lost_folders])
+        for folder, found in zip(lost_folders, cached):
+            if found:
+                folder.load_from_cache(found)
+
+        # the new children of the folders created by someone else must point to the winner node
+        relinked = self._link_parents(nodes)
+        await redis_srv.mset_by_keys({folder.cache_key: folder.dump() for folder in relinked if not folder.exist})
+
+    def _link_parents(self, nodes: list[FolderTrieNode]) -> list['FolderNode']:
+        """Point the new folder nodes to their parents and return the nodes which changed."""
+
+        changed = []
+        root = nodes[0].folder
+        if not root.exist:
+            root.folder_parent_geid = self.parent_folder_id
+
+        for trie_node in nodes:
+            for child in trie_node.children.values():
+                folder = child.folder
+                if not folder.exist and folder.folder_parent_geid != trie_node.folder.global_entity_id:
+                    folder.folder_parent_geid = trie_node.folder.global_entity_id
+                    changed.append(folder)
+
+        return changed
 
 
 class FolderNode:
@@ -100,36 +153,24 @@ class FolderNode:
         if folder_relative_path is None:
             self.folder_relative_path = ''
 
-    async def read_node(self):
-
-        await self.read_from_cache(
-            self.folder_relative_path,
-            self.folder_name,
-            self.project_code,
-            self.zone,
-        )
-
-        if not self.exist:
-
-            if self.folder_relative_path:
-                obj_path = os.path.join(self.zone, self.project_code, self.folder_relative_path, self.folder_name)
-            else:
-                obj_path = os.path.join(self.zone, self.project_code, self.folder_name)
-            await redis_srv.set_by_key(obj_path, json.dumps(self.__dict__))
-
-    async def read_from_cache(self, folder_relative_path, folder_name, project_code, zone):
-        """Read created nodes in the cache."""
-
-        obj_path = os.path.join(zone, project_code, folder_relative_path, folder_name)
-        found = await redis_srv.get_by_key(obj_path)
-        if found:
-            found = json.loads(found)
-            self.global_entity_id = found.get('global_entity_id')
-            self.folder_parent_geid = found.get('folder_parent_geid')
-            self.folder_creator = found.get('folder_creator')
-            self.project_code = found.get('project_code')
-            self.exist = True
-        return self.exist
+    @property
+    def cache_key(self) -> str:
+        """The key of the node in the folder cache."""
+
+        return os.path.join(self.zone, self.project_code, self.folder_relative_path, self.folder_name)
+
+    def dump(self) -> str:
+        return json.dumps(self.__dict__)
+
+    def load_from_cache(self, found: bytes) -> None:
+        """Read created node from the cache."""
+
+        found = json.loads(found)
+        self.global_entity_id = found.get('global_entity_id')
+        self.folder_parent_geid = found.get('folder_parent_geid')
+        self.folder_creator = found.get('folder_creator')
+        self.project_code = found.get('project_code')
+        self.exist = True
 
     async def lazy_save(self):
 
@@ -4,10 +4,9 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
-import httpx
-
 from app.commons.data_providers.redis import SrvAioRedisSingleton
 from app.commons.kafka_producer import get_kafka_producer
+from app.commons.registry import get_http_client
 from app.config import ConfigClass
 from app.logger import logger
 
@@ -50,14 +49,14 @@ async def check_minio() -> bool:
     url = http_protocal + ConfigClass.S3_INTERNAL + '/minio/health/cluster'
 
     try:
-        async with httpx.AsyncClient() as client:
-            res = await client.get(url)
+        client = get_http_client()
+        res = await client.get(url)
 
-            if res.status_code != 200:
-                logger.error('Cluster unavailable')
-                return False
+        if res.status_code != 200:
+            logger.error('Cluster unavailable')
+            return False
 
-            logger.info('Minio is connected')
+        logger.info('Minio is connected')
     except Exception as e:
         logger.error(f'Fail with error: {e}')
         return False
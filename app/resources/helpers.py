@@ -4,19 +4,32 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
+import asyncio
+import json
 import tarfile
 import zipfile
+import zlib
 from abc import ABCMeta
 from abc import abstractmethod
+from array import array
 from typing import Any
+from typing import AsyncIterator
+from typing import BinaryIO
+from typing import Iterable
+from typing import Iterator
 
 import py7zr
 import rarfile
 from fastapi.concurrency import run_in_threadpool
 from magic import Magic
 
+from app.config import ConfigClass
 from app.logger import logger
 from app.resources.archive_file_type_mapping import FILES_MIMETYPE
+from app.resources.preview_pool import PreviewLimitExceeded
+from app.resources.preview_pool import preview_pool
+
+MAGIC_HEADER_SIZE = 8192
 
 
 class ArchiveFile(metaclass=ABCMeta):
@@ -105,81 +118,299 @@ class ZipFile(ArchiveFile):
 
 
 class Archive:
-    def __init__(self, file_list: list[ArchiveFile]):
-        self.file_list = file_list
-
-    def get_structure(self):
-        results = {}
-        for file in self.file_list:
-            filename = file.name.split('/')[-1]
-            if not filename:
-                filename = file.name.split('/')[-2]
-            current_path = results
-            for path in file.name.split('/')[:-1]:
-                if path:
-                    if not current_path.get(path):
-                        current_path[path] = {'is_dir': True}
-                    current_path = current_path[path]
-
-            if not file.is_dir:
-                current_path[filename] = {
-                    'filename': filename,
-                    'size': file.size,
-                    'is_dir': False,
-                }
-        return results
-
-
-def read_tar(file_path: str) -> dict[str, Any]:
+    """
+    Summary:
+        The compact columnar preview of archive. The path segments are
+        interned once, the directories and files are kept as arrays of
+        parent index, name index and size instead of a dict per node. The
+        nested structure is only produced on output, either as dict or as
+        JSON text pieces which can be streamed.
+    """
+
+    def __init__(self, file_list: Iterable[ArchiveFile] = (), max_entries: int | None = None):
+        self.max_entries = max_entries or ConfigClass.ARCHIVE_PREVIEW_MAX_ENTRIES
+        self.entries = 0
+        self.truncated = False
+        self.markers = []
+        self.names = []
+        # the directory 0 is the root of archive
+        self.dir_parent = array('i', [-1])
+        self.dir_name = array('i', [-1])
+        self.file_parent = array('i')
+        self.file_name = array('i')
+        self.file_size = array('q')
+        self._segments = {}
+        self._dirs = {}
+        for file in file_list:
+            if not self.add(file):
+                break
+
+    @classmethod
+    def from_marker(cls, marker: str) -> 'Archive':
+        """Create the preview which only contains the message."""
+
+        archive = cls()
+        archive.markers.append(marker)
+        return archive
+
+    @property
+    def failed(self) -> bool:
+        """Whether the preview only tells the error of archive reading."""
+
+        return any(marker.startswith('Error') for marker in self.markers)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state['_segments'] = None
+        state['_dirs'] = None
+        return state
+
+    def dump(self) -> bytes:
+        """Serialize the columns into compressed bytes."""
+
+        columns = {
+            'max_entries': self.max_entries,
+            'entries': self.entries,
+            'truncated': self.truncated,
+            'markers': self.markers,
+            'names': self.names,
+            'dir_parent': self.dir_parent.tolist(),
+            'dir_name': self.dir_name.tolist(),
+            'file_parent': self.file_parent.tolist(),
+            'file_name': self.file_name.tolist(),
+            'file_size': self.file_size.tolist(),
+        }
+        return zlib.compress(json.dumps(columns, separators=(',', ':')).encode())
+
+    @classmethod
+    def load(cls, content: bytes) -> 'Archive':
+        columns = json.loads(zlib.decompress(content))
+        archive = cls(max_entries=columns['max_entries'])
+        archive.entries = columns['entries']
+        archive.truncated = columns['truncated']
+        archive.markers = columns['markers']
+        archive.names = columns['names']
+        archive.dir_parent = array('i', columns['dir_parent'])
+        archive.dir_name = array('i', columns['dir_name'])
+        archive.file_parent = array('i', columns['file_parent'])
+        archive.file_name = array('i', columns['file_name'])
+        archive.file_size = array('q', columns['file_size'])
+        archive._segments = None
+        archive._dirs = None
+        return archive
+
+    def _intern(self, segment: str) -> int:
+        if self._segments is None:
+            self._segments = {name: index for index, name in enumerate(self.names)}
+
+        index = self._segments.get(segment)
+        if index is None:
+            index = len(self.names)
+            self.names.append(segment)
+            self._segments[segment] = index
+        return index
+
+    def _get_dir(self, parent: int, segment: str) -> int:
+        if self._dirs is None:
+            self._dirs = {
+                (parent_index, name_index): index
+                for index, (parent_index, name_index) in enumerate(zip(self.dir_parent, self.dir_name))
+                if index
+            }
+
+        name = self._intern(segment)
+        index = self._dirs.get((parent, name))
+        if index is None:
+            index = len(self.dir_parent)
+            self.dir_parent.append(parent)
+            self.dir_name.append(name)
+            self._dirs[(parent, name)] = index
+        return index
+
+    def add(self, file: ArchiveFile) -> bool:
+        """Add the file into structure, return False once the entry cap is reached."""
+
+        if self.entries >= self.max_entries:
+            self.truncated = True
+            return False
+        self.entries += 1
+
+        segments = file.name.split('/')
+        parent = 0
+        for path in segments[:-1]:
+            if path:
+                parent = self._get_dir(parent, path)
+
+        if not file.is_dir:
+            self.file_parent.append(parent)
+            self.file_name.append(self._intern(segments[-1] or segments[-2]))
+            self.file_size.append(file.size)
+        return True
+
+    @staticmethod
+    def _group(parents: array, groups: int) -> tuple[array, array]:
+        """Order the indexes by their parent in one counting pass, the input order is kept."""
+
+        start = array('i', [0]) * (groups + 1)
+        for parent in parents:
+            if parent >= 0:
+                start[parent + 1] += 1
+        for index in range(groups):
+            start[index + 1] += start[index]
+
+        position = array('i', start)
+        order = array('i', [0]) * start[groups]
+        for index, parent in enumerate(parents):
+            if parent >= 0:
+                order[position[parent]] = index
+                position[parent] += 1
+        return start, order
+
+    def iter_json(self) -> Iterator[str]:
+        """Yield the nested structure as JSON text pieces without building it in memory."""
+
+        groups = len(self.dir_parent)
+        dir_start, dir_order = self._group(self.dir_parent, groups)
+        file_start, file_order = self._group(self.file_parent, groups)
+        names = [json.dumps(name) for name in self.names]
+
+        def children(directory: int) -> Iterator[tuple[bool, int]]:
+            for position in range(dir_start[directory], dir_start[directory + 1]):
+                yield True, dir_order[position]
+            for position in range(file_start[directory], file_start[directory + 1]):
+                yield False, file_order[position]
+
+        yield '{'
+        stack = [(children(0), True)]
+        while stack:
+            entries, first = stack.pop()
+            for is_dir, index in entries:
+                separator = '' if first else ', '
+                first = False
+                if is_dir:
+                    yield f'{separator}{names[self.dir_name[index]]}: {{"is_dir": true'
+                    stack.append((entries, False))
+                    stack.append((children(index), False))
+                    break
+
+                name = names[self.file_name[index]]
+                yield f'{separator}{name}: {{"filename": {name}, "size": {self.file_size[index]}, "is_dir": false}}'
+            else:
+                if stack:
+                    yield '}'
+                    continue
+
+                markers = self.markers[:]
+                if self.truncated:
+                    markers.append(f'Warning: The preview only contains the first {self.max_entries} entries')
+                for marker in markers:
+                    yield f'{"" if first else ", "}{json.dumps(marker)}: ""'
+                    first = False
+                yield '}'
+
+    def get_structure(self) -> dict[str, Any]:
+        return json.loads(''.join(self.iter_json()))
+
+
+def read_tar(file_path: str | BinaryIO) -> Archive:
+    """
+    Summary:
+        The tar headers are walked one by one and dropped from `members`
+        right away, so the memory stays bounded by the entry cap. A plain
+        tar is skipped over by seeking, a compressed one has to be
+        decompressed as a stream anyway.
+    """
     try:
-        with tarfile.open(file_path, mode='r:*') as archive_files:
-            archive = Archive([TarFile(file) for file in archive_files])
-        return archive.get_structure()
+        if isinstance(file_path, str):
+            archive_files = tarfile.open(file_path, mode='r:*')
+        else:
+            archive_files = tarfile.open(fileobj=file_path, mode='r:*')
+        with archive_files:
+            archive = Archive()
+            for file_info in archive_files:
+                archive_files.members = []
+                if not archive.add(TarFile(file_info)):
+                    break
+        return archive
     except tarfile.TarError:
         logger.exception(f'The file {file_path} is not a valid 7z')
-        return {'Error: The file is not a valid 7z file': ''}
+        return Archive.from_marker('Error: The file is not a valid 7z file')
 
 
-def read_7z(file_path: str) -> dict[str, Any]:
+def read_7z(file_path: str | BinaryIO) -> Archive:
     try:
         with py7zr.SevenZipFile(file_path, 'r') as archive_files:
             archive = Archive([SevenZipFile(file) for file in archive_files.files])
-        return archive.get_structure()
+        return archive
     except py7zr.Bad7zFile:
         logger.exception(f'The file {file_path} is not a valid 7z')
-        return {'Error: The file is not a valid 7z file': ''}
+        return Archive.from_marker('Error: The file is not a valid 7z file')
 
 
-def read_zip(file_path: str) -> dict[str, Any]:
+def read_zip(file_path: str | BinaryIO) -> Archive:
     try:
         with zipfile.ZipFile(file_path, 'r') as archive_files:
             archive = Archive([ZipFile(file) for file in archive_files.infolist()])
-        return archive.get_structure()
+        return archive
     except zipfile.BadZipfile:
         logger.exception(f'The file {file_path} is not a valid zip')
-        return {'Error: The file is not a valid zip file': ''}
+        return Archive.from_marker('Error: The file is not a valid zip file')
 
 
-def read_rar(file_path: str) -> dict[str, Any]:
+def read_rar(file_path: str | BinaryIO) -> Archive:
     try:
         with rarfile.RarFile(file_path, 'r') as archive_files:
             archive = Archive([RarFile(file) for file in archive_files.infolist()])
-        return archive.get_structure()
+        return archive
     except rarfile.BadRarFile:
         logger.exception(f'The file {file_path} is not a valid rar')
-        return {'Error: The file is not a valid rar file': ''}
+        return Archive.from_marker('Error: The file is not a valid rar file')
+
+
+async def iter_archive_payload(archive: Archive | None, file_id: str) -> AsyncIterator[bytes]:
+    """
+    Summary:
+        Stream the body of dataops archive request. The preview is written
+        as nested JSON in pieces of about `ARCHIVE_PREVIEW_STREAM_CHUNK_SIZE`
+        bytes, so the whole document is never held in memory.
+    Parameters:
+        - archive(Archive): the preview of archive
+        - file_id(string): the id of file item
+    Return:
+        - (bytes) the pieces of JSON body
+    """
+
+    pieces = archive.iter_json() if archive is not None else iter(['null'])
+    buffer = ['{"archive_preview": ']
+    buffered = 0
+    for piece in pieces:
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= ConfigClass.ARCHIVE_PREVIEW_STREAM_CHUNK_SIZE:
+            yield ''.join(buffer).encode()
+            buffer, buffered = [], 0
+            # let the other tasks run between the pieces
+            await asyncio.sleep(0)
+
+    buffer.append(f', "file_id": {json.dumps(file_id)}}}')
+    yield ''.join(buffer).encode()
 
 
-async def generate_archive_preview(file_path: str, file_type: str) -> dict:
+async def generate_archive_preview(file_path: str | BinaryIO, file_type: str) -> Archive | None:
     """
     Parameters:
-        - file_path(string): the path of file
+        - file_path(string|BinaryIO): the path of file or the seekable file object
         - file_type(string): the extestension of the file
     Return:
-        - (dict) folder structure inside
+        - (Archive) folder structure inside
     """
     m = Magic(mime=True)
-    file_mimetype = await run_in_threadpool(m.from_file, file_path)
+    if isinstance(file_path, str):
+        file_mimetype = await run_in_threadpool(m.from_file, file_path)
+    else:
+        header = await run_in_threadpool(file_path.read, MAGIC_HEADER_SIZE)
+        await run_in_threadpool(file_path.seek, 0)
+        file_mimetype = m.from_buffer(header)
     extracted_mine_type = FILES_MIMETYPE.get(file_mimetype, None)
 
     if file_type != extracted_mine_type:
@@ -187,13 +418,16 @@ async def generate_archive_preview(file_path: str, file_type: str) -> dict:
 
     try:
         if extracted_mine_type == 'zip':
-            return await run_in_threadpool(read_zip, file_path)
+            return await preview_pool.run(read_zip, file_path)
         elif extracted_mine_type == 'tar':
-            return await run_in_threadpool(read_tar, file_path)
+            return await preview_pool.run(read_tar, file_path)
         elif extracted_mine_type == '7z':
-            return await run_in_threadpool(read_7z, file_path)
+            return await preview_pool.run(read_7z, file_path)
         elif extracted_mine_type == 'rar':
-            return await run_in_threadpool(read_rar, file_path)
+            return await preview_pool.run(read_rar, file_path)
+    except PreviewLimitExceeded as e:
+        logger.warning(f'Skip the preview of {file_path}: {e}')
+        return Archive.from_marker(f'Error: {e}')
     except Exception as e:
         logger.exception(f'Error adding file preview for {file_path}: {str(e)}')
         raise e
@@ -6,6 +6,7 @@
 
 import httpx
 
+from app.commons.registry import get_http_client
 from app.config import ConfigClass
 
 
@@ -16,8 +17,8 @@ class ResourceAlreadyInUsed(Exception):
 async def data_ops_request(resource_key: str, operation: str, method: str) -> dict:
     url = ConfigClass.DATAOPS_SERVICE_V2 + 'resource/lock/'
     post_json = {'resource_key': resource_key, 'operation': operation}
-    async with httpx.AsyncClient() as client:
-        response = await client.request(url=url, method=method, json=post_json, timeout=3600)
+    client = get_http_client()
+    response = await client.request(url=url, method=method, json=post_json, timeout=3600)
     if response.status_code != 200:
         raise ResourceAlreadyInUsed(f'resource {resource_key} already in used')
 
@@ -0,0 +1,148 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+import multiprocessing
+import resource
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+from typing import Callable
+
+from app.config import ConfigClass
+from app.logger import logger
+
+
+class PreviewLimitExceeded(Exception):
+    pass
+
+
+def _limit_worker_memory(memory_limit: int) -> None:
+    if memory_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _raise_timeout(signum, frame) -> None:
+    raise PreviewLimitExceeded('The archive preview exceeds the time limit')
+
+
+def _run_with_limits(func: Callable, file: Any, timeout: int) -> Any:
+    """Run the reader inside the worker process and stop it with SIGALRM after the timeout."""
+
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.alarm(timeout)
+    try:
+        return func(file)
+    except MemoryError:
+        raise PreviewLimitExceeded('The archive preview exceeds the memory limit')
+    finally:
+        signal.alarm(0)
+
+
+class PreviewPoolStats:
+    """Counters of the preview jobs handled by the process pool."""
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.limit_exceeded = 0
+
+    def dict(self) -> dict[str, int]:
+        running = min(self.in_flight, self.workers)
+        return {
+            'workers': self.workers,
+            'running': running,
+            'waiting': self.in_flight - running,
+            'completed': self.completed,
+            'failed': self.failed,
+            'limit_exceeded': self.limit_exceeded,
+        }
+
+
+class ArchivePreviewPool:
+    """
+    Summary:
+        The dedicated process pool to parse the archives for preview. The
+        parsing holds the GIL for a long time, so it is kept out of the
+        thread pool which serves the requests. Each job is limited by
+        `ARCHIVE_PREVIEW_TIMEOUT` seconds and each worker by
+        `ARCHIVE_PREVIEW_MEMORY_LIMIT` bytes of address space.
+    """
+
+    def __init__(self, workers: int, timeout: int, memory_limit: int) -> None:
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.stats = PreviewPoolStats(workers)
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_limit_worker_memory,
+                initargs=(self.memory_limit,),
+            )
+
+        return self._executor
+
+    def _reset(self) -> None:
+        """Kill the workers, the next job starts a new pool."""
+
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable, file: Any) -> Any:
+        """
+        Summary:
+            Run the reader with the file in a worker process.
+        Parameter:
+            - func(Callable): the module level reader function
+            - file(str|BinaryIO): the path or the picklable file object
+        Return:
+            - the result of reader
+        """
+
+        loop = asyncio.get_running_loop()
+        self.stats.in_flight += 1
+        try:
+            future = loop.run_in_executor(self._get_executor(), _run_with_limits, func, file, self.timeout)
+            # the grace period covers the queue wait, the worker is killed if the alarm does not fire
+            result = await asyncio.wait_for(future, self.timeout * (1 + self.stats.in_flight / self.workers) + 5)
+        except PreviewLimitExceeded:
+            self.stats.limit_exceeded += 1
+            raise
+        except (asyncio.TimeoutError, BrokenProcessPool):
+            logger.error('The archive preview worker does not respond, restart the pool')
+            self.stats.limit_exceeded += 1
+            self._reset()
+            raise PreviewLimitExceeded('The archive preview exceeds the resource limit')
+        except Exception:
+            self.stats.failed += 1
+            raise
+        finally:
+            self.stats.in_flight -= 1
+
+        self.stats.completed += 1
+        return result
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+preview_pool = ArchivePreviewPool(
+    ConfigClass.ARCHIVE_PREVIEW_WORKERS, ConfigClass.ARCHIVE_PREVIEW_TIMEOUT, ConfigClass.ARCHIVE_PREVIEW_MEMORY_LIMIT
+)
@@ -9,11 +9,15 @@ from fastapi import Depends
 from fastapi import Request
 from fastapi.responses import Response
 
-from app.commons.kafka_producer import get_kafka_producer
+from app.commons.finalize_queue import finalize_queue
+from app.commons.kafka_producer import kakfa_producer
+from app.commons.object_storage import part_stream_stats
+from app.commons.registry import client_registry
 from app.config import ConfigClass
 from app.resources.health_check import check_kafka
 from app.resources.health_check import check_minio
 from app.resources.health_check import check_redis
+from app.resources.preview_pool import preview_pool
 
 router = APIRouter()
 
@@ -29,20 +33,6 @@ async def root(request: Request):
     }
 
 
-@router.on_event('shutdown')
-async def shutdown_event():
-    """
-    Summary:
-        the shutdown event to gracefully close the
-        kafka producer.
-    """
-
-    kp = await get_kafka_producer()
-    await kp.close_connection()
-
-    return
-
-
 @router.get('/v1/health', summary='Health check for RDS, Redis and Kafka')
 async def check_db_connection(
     check_kafka: bool = Depends(check_kafka),
@@ -52,3 +42,15 @@ async def check_db_connection(
     if check_kafka and check_redis and check_minio:
         return Response(status_code=204)
     return Response(status_code=503)
+
+
+@router.get('/v1/metrics', summary='Usage metrics of the shared downstream clients')
+async def metrics() -> dict:
+    return {
+        'http_pool': client_registry.get_http_pool_usage(),
+        'object_storage_pool': client_registry.get_object_storage_pool_usage(),
+        'part_streams': part_stream_stats.dict(),
+        'kafka': kakfa_producer.stats.dict(),
+        'archive_preview': preview_pool.stats.dict(),
+        'finalize_queue': await finalize_queue.usage(),
+    }
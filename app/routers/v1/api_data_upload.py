@@ -7,16 +7,16 @@
 import asyncio
 import json
 import os
-import shutil
+import random
 import time
 import unicodedata as ud
+from typing import AsyncIterator
 from uuid import uuid4
 
-import httpx
 from common import ProjectClient
 from common import ProjectNotFoundException
+from common.object_storage_adaptor.boto3_client import Boto3Client
 from common.object_storage_adaptor.boto3_client import TokenError
-from common.object_storage_adaptor.boto3_client import get_boto3_client
 from fastapi import APIRouter
 from fastapi import BackgroundTasks
 from fastapi import Depends
@@ -26,12 +26,36 @@ from fastapi import Header
 from fastapi import Request
 from fastapi import UploadFile
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi_utils import cbv
 
+from app.commons.archive_index import EdgeCapture
+from app.commons.archive_index import get_edge_sizes
+from app.commons.archive_index import pop_archive_edges
+from app.commons.archive_index import save_archive_edges
+from app.commons.data_providers.redis_part_tracker import clear_uploaded_parts
+from app.commons.data_providers.redis_part_tracker import get_uploaded_parts
+from app.commons.data_providers.redis_part_tracker import record_uploaded_part
+from app.commons.data_providers.redis_part_tracker import wait_for_uploaded_parts
+from app.commons.data_providers.redis_path_filter import add_existing_paths
+from app.commons.data_providers.redis_path_filter import filter_possible_paths
+from app.commons.data_providers.redis_preview_cache import cache_archive_preview
+from app.commons.data_providers.redis_preview_cache import get_cached_archive_preview
 from app.commons.data_providers.redis_project_session_job import EFileStatus
 from app.commons.data_providers.redis_project_session_job import SessionJob
 from app.commons.data_providers.redis_project_session_job import get_fsm_object
+from app.commons.data_providers.redis_project_session_job import session_job_bulk_save
+from app.commons.finalize_queue import finalize_queue
 from app.commons.kafka_producer import get_kafka_producer
+from app.commons.object_storage import RangedObjectReader
+from app.commons.object_storage import get_upload_file_size
+from app.commons.object_storage import iter_upload_file
+from app.commons.object_storage import list_all_parts
+from app.commons.object_storage import stream_part_upload
+from app.commons.registry import get_http_client
+from app.commons.registry import get_internal_boto3_client
+from app.commons.registry import get_project_client
+from app.commons.registry import get_public_boto3_client
 from app.components.request.network import Network
 from app.config import ConfigClass
 from app.logger import logger
@@ -50,7 +74,9 @@ from app.resources.decorator import header_enforcement
 from app.resources.error_handler import ECustomizedError
 from app.resources.error_handler import catch_internal
 from app.resources.error_handler import customized_error_template
+from app.resources.helpers import Archive
 from app.resources.helpers import generate_archive_preview
+from app.resources.helpers import iter_archive_payload
 
 from .exceptions import InvalidPayload
 from .exceptions import ResourceAlreadyExist
@@ -90,39 +116,9 @@ class APIUpload:
         The file and folder cannot with same name
     """
 
-    def __init__(self):
-        self.project_client = ProjectClient(ConfigClass.PROJECT_SERVICE, ConfigClass.REDIS_URL)
-        self.boto3_client, self.boto3_client_public = self._connect_to_object_storage()
-
-    def _connect_to_object_storage(self):
-        loop = asyncio.new_event_loop()
-
-        logger.info('Initialize the boto3 client')
-        try:
-            boto3_client = loop.run_until_complete(
-                get_boto3_client(
-                    ConfigClass.S3_INTERNAL,
-                    access_key=ConfigClass.S3_ACCESS_KEY,
-                    secret_key=ConfigClass.S3_SECRET_KEY,
-                    https=ConfigClass.S3_INTERNAL_HTTPS,
-                )
-            )
-
-            boto3_client_public = loop.run_until_complete(
-                get_boto3_client(
-                    ConfigClass.S3_PUBLIC,
-                    access_key=ConfigClass.S3_ACCESS_KEY,
-                    secret_key=ConfigClass.S3_SECRET_KEY,
-                    https=ConfigClass.S3_PUBLIC_HTTPS,
-                )
-            )
-
-        except Exception:
-            logger.exception('Fail to create connection with boto3')
-            raise
-
-        loop.close()
-        return boto3_client, boto3_client_public
+    boto3_client: Boto3Client = Depends(get_internal_boto3_client)
+    boto3_client_public: Boto3Client = Depends(get_public_boto3_client)
+    project_client: ProjectClient = Depends(get_project_client)
 
     @router.post(
         '/files/jobs',
@@ -193,50 +189,53 @@ class APIUpload:
 
             for upload_data in request_payload.data:
                 upload_data.resumable_filename = ud.normalize('NFC', upload_data.resumable_filename)
-            status_mgr = await get_fsm_object(
-                session_id,
-                project_code,
-                request_payload.operator,
-            )
-
             bucket = ('gr-' if namespace == 'greenroom' else 'core-') + project_code
             file_keys = [os.path.join(x.resumable_relative_path, x.resumable_filename) for x in request_payload.data]
             upload_ids = await self.boto3_client.prepare_multipart_upload(bucket, file_keys)
 
             job_list = []
-            to_create_items, item_list = [], []
-            for file_key, upload_id in zip(file_keys, upload_ids):
-
-                file_path, file_name = file_key.rsplit('/', 1)
-                items_info, file_info = await folder_creation(
-                    project_code,
-                    request_payload.operator,
-                    request_payload.current_folder_node,
-                    request_payload.parent_folder_id,
-                    file_path,
-                    file_name,
-                    request_payload.job_type,
-                    upload_id,
-                )
-                to_create_items.extend(items_info)
-                item_list.append(file_info)
+            to_create_items, item_list = await folder_creation(
+                project_code,
+                request_payload.operator,
+                request_payload.current_folder_node,
+                request_payload.parent_folder_id,
+                file_keys,
+                request_payload.job_type,
+                upload_ids,
+            )
 
             url = ConfigClass.METADATA_SERVICE + 'items/batch/'
-            async with httpx.AsyncClient() as client:
-                item_res = await client.post(url, json={'items': to_create_items}, timeout=10)
-                if item_res.status_code == 409:
-                    raise ResourceAlreadyExist(f'The resource already exist: {item_res.text}')
-                elif item_res.status_code != 200:
-                    raise Exception(f'Fail to create metadata {to_create_items} in postgres: {item_res.text}')
+            client = get_http_client()
+            item_res = await client.post(
+                url, json={'items': to_create_items}, timeout=ConfigClass.METADATA_SERVICE_TIMEOUT
+            )
+            if item_res.status_code == 409:
+                raise ResourceAlreadyExist(f'The resource already exist: {item_res.text}')
+            elif item_res.status_code != 200:
+                raise Exception(f'Fail to create metadata {to_create_items} in postgres: {item_res.text}')
+            await add_existing_paths(
+                project_code,
+                0 if namespace == 'greenroom' else 1,
+                [f'{x["parent_path"]}/{x["name"]}' for x in to_create_items if x['type'] == 'folder'],
+            )
 
+            jobs = []
             for item in item_list:
+                status_mgr = await get_fsm_object(
+                    session_id,
+                    project_code,
+                    request_payload.operator,
+                )
                 await status_mgr.set_job_id(str(uuid4()))
                 status_mgr.set_source([item.get('parent_path') + '/' + item.get('name')])
                 status_mgr.add_payload('resumable_identifier', item.get('upload_id'))
 
                 status_mgr.add_payload('item_id', item.get('id'))
-                await status_mgr.set_status(EFileStatus.RUNNING)
+                await status_mgr.set_status(EFileStatus.RUNNING, save=False)
+                jobs.append(status_mgr)
 
+            await session_job_bulk_save(jobs)
+            for status_mgr in jobs:
                 _, _, job_recorded = status_mgr.get_kv_entity()
                 job_list.append(job_recorded)
 
@@ -280,6 +279,7 @@ class APIUpload:
         resumable_filename: str = Form(...),
         resumable_relative_path: str = Form(''),
         resumable_chunk_number: int = Form(...),
+        resumable_total_chunks: int | None = Form(None),
         session_id: str = Header(None),
         chunk_data: UploadFile = File(...),
     ):
@@ -287,8 +287,8 @@ class APIUpload:
         Summary:
             The second api that the client side will call during the file
              upload. The data is uploaded throught the <Multipart Upload>.
-            The api will create the temp folder if it does not exist. Then
-             the chunk_data will be saved into the temp folder.
+            The chunk_data is streamed to the object storage part by
+             bounded blocks without loading the whole chunk into memory.
         Header:
             - session_id(string): The unique session id from client side
         Form:
@@ -298,27 +298,134 @@ class APIUpload:
             - resumable_relative_path(string): the relative path of the file
             - resumable_identifier(string): The job identifier for each file
             - resumable_chunk_number(string): The integer id for each chunk
+            - resumable_total_chunks(int optional): The number of total chunks,
+                it allows to keep the archive index of first and last chunk
         Return:
             - 200, Succeed
         """
 
+        chunk_size = get_upload_file_size(chunk_data)
+
+        return await self._upload_chunk(
+            project_code,
+            operator,
+            resumable_identifier,
+            resumable_filename,
+            resumable_relative_path,
+            resumable_chunk_number,
+            session_id,
+            iter_upload_file(chunk_data, ConfigClass.CHUNK_STREAM_BLOCK_SIZE),
+            chunk_size,
+            resumable_total_chunks,
+        )
+
+    @router.post(
+        '/files/chunks/{resumable_identifier}/{resumable_chunk_number}',
+        tags=[_API_TAG],
+        response_model=ChunkUploadResponse,
+        summary='upload raw binary chunk process.',
+    )
+    @catch_internal(_API_NAMESPACE)
+    @header_enforcement(['session_id'])
+    async def upload_raw_chunk(
+        self,
+        request: Request,
+        resumable_identifier: str,
+        resumable_chunk_number: int,
+        project_code: str,
+        operator: str,
+        resumable_filename: str,
+        resumable_relative_path: str = '',
+        resumable_total_chunks: int | None = None,
+        session_id: str = Header(None),
+        content_length: int | None = Header(None),
+    ):
+        """
+        Summary:
+            The alternative of chunk upload api which accepts the chunk as
+             raw `application/octet-stream` body. The metadata is passed in
+             the path and query parameters, so the body skips the multipart
+             form parsing and is streamed directly to the object storage.
+        Header:
+            - session_id(string): The unique session id from client side
+            - content_length(int): The size of chunk
+        Path:
+            - resumable_identifier(string): The job identifier for each file
+            - resumable_chunk_number(int): The integer id for each chunk
+        Query:
+            - project_code(string): the target project will upload to
+            - operator(string): the name of operator
+            - resumable_filename(string): the name of file
+            - resumable_relative_path(string): the relative path of the file
+            - resumable_total_chunks(int optional): The number of total chunks
+        Return:
+            - 200, Succeed
+        """
+
+        if content_length is None:
+            _res = APIResponse()
+            _res.code = EAPIResponseCode.bad_request
+            _res.error_msg = 'content_length is required'
+            return _res.json_response()
+
+        return await self._upload_chunk(
+            project_code,
+            operator,
+            resumable_identifier,
+            resumable_filename,
+            resumable_relative_path,
+            resumable_chunk_number,
+            session_id,
+            request.stream(),
+            content_length,
+            resumable_total_chunks,
+        )
+
+    async def _upload_chunk(
+        self,
+        project_code: str,
+        operator: str,
+        resumable_identifier: str,
+        resumable_filename: str,
+        resumable_relative_path: str,
+        resumable_chunk_number: int,
+        session_id: str,
+        chunk_stream: AsyncIterator[bytes],
+        chunk_size: int,
+        resumable_total_chunks: int | None = None,
+    ) -> JSONResponse:
+        """Stream the chunk into the object storage part and mark the job failed on error."""
+
         _res = APIResponse()
 
         resumable_filename = ud.normalize('NFC', resumable_filename)
         file_key = resumable_relative_path + '/' + resumable_filename
 
+        capture = None
+        head_size, tail_size = get_edge_sizes(resumable_filename, resumable_chunk_number, resumable_total_chunks)
+        if head_size or tail_size:
+            capture = EdgeCapture(chunk_stream, head_size, tail_size)
+            chunk_stream = capture
+
         logger.info('Uploading file %s chunk %s', resumable_filename, resumable_chunk_number)
         try:
             bucket = ('gr-' if ConfigClass.namespace == 'greenroom' else 'core-') + project_code
 
-            logger.info('Start to read the chunks')
-            file_content = await chunk_data.read()
-            logger.info('Chunk size is %s', len(file_content))
-            etag_info = await self.boto3_client.part_upload(
-                bucket, file_key, resumable_identifier, resumable_chunk_number, file_content
+            logger.info('Start to stream the chunk with size %s', chunk_size)
+            etag_info = await stream_part_upload(
+                self.boto3_client,
+                bucket,
+                file_key,
+                resumable_identifier,
+                resumable_chunk_number,
+                chunk_stream,
+                chunk_size,
             )
 
             logger.info('finish the chunk upload: %s', json.dumps(etag_info))
+            await record_uploaded_part(resumable_identifier, resumable_chunk_number, etag_info['ETag'], chunk_size)
+            if capture is not None:
+                await save_archive_edges(resumable_identifier, capture)
 
             _res.code = EAPIResponseCode.success
             _res.result = {'msg': 'Succeed'}
@@ -428,15 +535,28 @@ class APIUpload:
             os.path.join, request_payload.resumable_relative_path, request_payload.resumable_filename
         )
         status_mgr.set_source([obj_path])
+        # the status is recorded first, so the worker never sees it go back from the final one
+        job_recorded = await status_mgr.set_status(EFileStatus.CHUNK_UPLOADED)
 
-        background_tasks.add_task(
-            finalize_worker,
-            logger,
-            request_payload,
-            status_mgr,
-            self.boto3_client,
-            network.origin,
-        )
+        if ConfigClass.FINALIZE_QUEUE_ENABLED:
+            # the job survives the restart of pod and is run by the queue workers
+            await finalize_queue.enqueue(
+                {
+                    'request_payload': request_payload.dict(),
+                    'session_id': session_id,
+                    'target_names': status_mgr.target_names,
+                    'network_origin': network.origin,
+                }
+            )
+        else:
+            background_tasks.add_task(
+                finalize_worker,
+                logger,
+                request_payload,
+                status_mgr,
+                self.boto3_client,
+                network.origin,
+            )
         logger.audit(
             'Successfully submitted a task for combining uploaded chunks.',
             username=request_payload.operator,
@@ -444,7 +564,6 @@ class APIUpload:
             job_id=request_payload.job_id,
         )
         logger.info('finalize_worker started')
-        job_recorded = await status_mgr.set_status(EFileStatus.CHUNK_UPLOADED)
         _res.code = EAPIResponseCode.success
         _res.result = job_recorded
         return _res.json_response()
@@ -455,51 +574,50 @@ async def folder_creation(
     operator: str,
     current_folder: str,
     parent_folder_id: str,
-    file_path: str,
-    file_name: str,
+    file_keys: list[str],
     job_type: str,
-    upload_id: str,
+    upload_ids: list[str],
 ):  # noqa: C901
     """
     Summary:
-        The function will batch create the tree path based on file_path.
-        For example, if the file_path is /A/B/C that folder B and C
-        do not exist, then function will batch create them
+        The function will batch create the tree paths based on the file keys
+        of the whole upload. For example, if the file keys are /A/B/C/file1
+        and /A/B/D/file2 that folder B, C and D do not exist, then function
+        will batch create them. The folders shared by several files are
+        resolved only once.
     Parameters:
         - project_code(string): the target project will upload to
         - operator(string): the name of operator
-        - file_path(string): the relative path of the file(without ending
-            slash)
-        - file_name: the name of tile
+        - current_folder(string): the root level folder that will be uploaded
+        - parent_folder_id(string): the id of parent node of root folder
+        - file_keys(list): the relative path of each file including its name
         - job_type: AS_FOLDER or AS_FILE
-        - upload_id: the unique id for each upload
+        - upload_ids: the unique id for each upload
     Return:
-        - The last node in the tree path. In the above example, the function
-            will return folder node C
+        - the folder and file items to create, and the file items in the
+            same order as file keys
     """
 
-    folder_create_duration = 0
-
     folder_create_start_time = time.time()
-    folder_mgr = FolderMgr(
-        project_code,
-        file_path,
-    )
+
+    file_paths, file_names = [], []
+    for file_key in file_keys:
+        file_path, file_name = file_key.rsplit('/', 1)
+        file_paths.append(file_path)
+        file_names.append(file_name)
 
     to_create_items = []
-    last_node_id = parent_folder_id
+    last_node_ids = [parent_folder_id] * len(file_keys)
     if job_type == 'AS_FOLDER':
-        await folder_mgr.create(operator, current_folder, parent_folder_id)
+        folder_mgr = FolderMgr(project_code, current_folder, parent_folder_id)
+        last_node_ids = await folder_mgr.create(operator, file_paths)
         to_create_items = folder_mgr.to_create
-        last_node_id = folder_mgr.last_node.global_entity_id
 
-    folder_create_duration += time.time() - folder_create_start_time
-
-    logger.info(f'Save to Cache Folder Time: {folder_create_duration}')
-
-    batch_folder_create_start_time = time.time()
-    try:
+    logger.info(f'Save to Cache Folder Time: {time.time() - folder_create_start_time}')
+    logger.info(f'New Folders saved: {len(to_create_items)}')
 
+    item_list = []
+    for file_path, file_name, last_node_id, upload_id in zip(file_paths, file_names, last_node_ids, upload_ids):
         data = {
             'id': str(uuid4()),
             'parent': last_node_id,
@@ -513,18 +631,162 @@ async def folder_creation(
             'container_type': 'project',
             'upload_id': upload_id,
         }
-        to_create_items.append(data)
+        item_list.append(data)
 
-        logger.info(f'New Folders saved: {len(to_create_items)}')
-        logger.info(f'New Node Creation Time: {time.time() - batch_folder_create_start_time}')
-
-    except Exception:
-        logger.exception('Error when create the folder tree')
-        raise
+    to_create_items.extend(item_list)
 
     logger.info('[SUCCEED] Done')
 
-    return to_create_items, data
+    return to_create_items, item_list
+
+
+def to_chunks_info(parts: list[dict]) -> list[dict]:
+    """Get the part numbers and etags without quotes to complete the multipart upload."""
+
+    return [{'PartNumber': x.get('PartNumber'), 'ETag': x.get('ETag').replace("\"", '')} for x in parts]
+
+
+async def collect_upload_parts(
+    boto3_client, bucket: str, obj_path: str, resumable_identifier: str, total_chunks: int
+) -> tuple[list[dict], bool]:
+    """
+    Summary:
+        The function returns the parts to combine. The ledger recorded by
+        the chunk upload api is used when it has every part, otherwise the
+        parts are listed from object storage until they are all present.
+        The uploads sampled by `PART_LEDGER_VERIFY_RATE` are listed anyway
+        to check the ledger against object storage.
+    Parameter:
+        - boto3_client(Boto3Client): the client of internal object storage
+        - bucket(str): the bucket name
+        - obj_path(str): the object path of file
+        - resumable_identifier(str): the upload id of multipart upload
+        - total_chunks(int): the number of parts of upload
+    Return:
+        - list: the parts ordered by part number
+        - bool: whether the parts come from the ledger
+    """
+
+    parts = await get_uploaded_parts(resumable_identifier)
+    ledger_complete = len(parts) == total_chunks
+    if ledger_complete and random.random() >= ConfigClass.PART_LEDGER_VERIFY_RATE:
+        return parts, True
+
+    for retry_count in range(ConfigClass.PART_LIST_ATTEMPTS):
+        if retry_count:
+            await asyncio.sleep(retry_count)
+        s3_parts = await list_all_parts(boto3_client, bucket, obj_path, resumable_identifier, total_chunks)
+        if len(s3_parts) >= total_chunks:
+            break
+
+    if ledger_complete and to_chunks_info(parts) != to_chunks_info(s3_parts):
+        logger.warning(f'The part ledger of {resumable_identifier} does not match the object storage')
+
+    return s3_parts, False
+
+
+async def combine_upload_parts(
+    boto3_client, bucket: str, obj_path: str, resumable_identifier: str, total_chunks: int
+) -> tuple[dict, list[dict]]:
+    """
+    Summary:
+        The function waits for the last part, then combines the parts of
+        multipart upload. When the parts from ledger fail to combine, they
+        are listed from object storage and combined again.
+    Parameter:
+        - boto3_client(Boto3Client): the client of internal object storage
+        - bucket(str): the bucket name
+        - obj_path(str): the object path of file
+        - resumable_identifier(str): the upload id of multipart upload
+        - total_chunks(int): the number of parts of upload
+    Return:
+        - dict: the result of complete multipart upload
+        - list: the combined parts ordered by part number
+    """
+
+    # the chunk upload api announces each part, so the combine starts once the last one lands
+    await wait_for_uploaded_parts(resumable_identifier, total_chunks)
+    parts, from_ledger = await collect_upload_parts(boto3_client, bucket, obj_path, resumable_identifier, total_chunks)
+    try:
+        result = await boto3_client.combine_chunks(bucket, obj_path, resumable_identifier, to_chunks_info(parts))
+    except Exception as e:
+        if not from_ledger:
+            raise
+        # a part can be uploaded again after it is recorded, so object storage has the final say
+        logger.warning(f'Fail to combine the parts from ledger, list them from object storage: {e}')
+        parts = await list_all_parts(boto3_client, bucket, obj_path, resumable_identifier, total_chunks)
+        result = await boto3_client.combine_chunks(bucket, obj_path, resumable_identifier, to_chunks_info(parts))
+    await clear_uploaded_parts(resumable_identifier)
+
+    return result, parts
+
+
+async def run_finalize_job(job: dict) -> None:
+    """
+    Summary:
+        The function runs the finalize job taken from the finalize queue.
+        The job only holds the plain values, so the payload, the job status
+        and the object storage client are built again in the worker. The
+        job which fails in `finalize_worker` is already marked as FAILED,
+        so it is finished instead of being retried by the queue.
+    Parameter:
+        - job(dict): the job added by the `on_success` api
+    """
+
+    request_payload = OnSuccessUploadPOST(**job['request_payload'])
+    status_mgr = await get_fsm_object(
+        job['session_id'],
+        request_payload.project_code,
+        request_payload.operator,
+        request_payload.job_id,
+    )
+    status_mgr.set_source(job['target_names'])
+    boto3_client = await get_internal_boto3_client()
+
+    try:
+        await finalize_worker(logger, request_payload, status_mgr, boto3_client, job['network_origin'])
+    except Exception as e:
+        # running the job again could combine twice or flip the final status
+        logger.error(f'Finalize job {request_payload.job_id} is marked as FAILED: {e}')
+
+
+async def get_archive_preview(
+    boto3_client, bucket: str, obj_path: str, resumable_identifier: str, etag: str, archive_type: str, object_size: int
+) -> Archive | None:
+    """
+    Summary:
+        The function returns the preview of combined archive. The preview
+        is taken from cache by the ETag, otherwise the archive is read
+        through range requests instead of being downloaded and the preview
+        is cached.
+    Parameter:
+        - boto3_client(Boto3Client): the client of internal object storage
+        - bucket(str): the bucket name
+        - obj_path(str): the object path of file
+        - resumable_identifier(str): the unique identifier for file
+        - etag(str): the ETag of combined object
+        - archive_type(str): the type of archive
+        - object_size(int): the size of combined object
+    Return:
+        - Archive: the preview of archive
+    """
+
+    head, tail = await pop_archive_edges(resumable_identifier)
+    etag = etag.replace("\"", '')
+    archive_preview = await get_cached_archive_preview(etag)
+    if archive_preview is not None:
+        return archive_preview
+
+    download_url = await boto3_client.get_download_presigned_url(bucket, obj_path)
+    with RangedObjectReader(download_url, name=obj_path, size=object_size if tail else None) as archive_file:
+        # the bytes captured during chunk upload save the reads of archive index
+        archive_file.preload(0, head)
+        if tail:
+            archive_file.preload(object_size - len(tail), tail)
+        archive_preview = await generate_archive_preview(archive_file, archive_type)
+    await cache_archive_preview(etag, archive_preview)
+
+    return archive_preview
 
 
 async def finalize_worker(
@@ -546,7 +808,6 @@ async def finalize_worker(
             - calling the dataops utiltiy api to add the zip preview if upload
                 zip file.
             - update the job status.
-            - remove the temperary folder
             - unlock the file node
     Parameter:
         - request_payload(OnSuccessUploadPOST)
@@ -577,8 +838,6 @@ async def finalize_worker(
     bucket = ('gr-' if namespace == 'greenroom' else 'core-') + project_code
     obj_path = await run_in_threadpool(os.path.join, file_path, file_name)
 
-    temp_dir = await run_in_threadpool(os.path.join, ConfigClass.TEMP_BASE, resumable_identifier)
-
     pre_time = time.time()
     logger.warning(f'prepare time is {pre_time - start_time}')
 
@@ -591,19 +850,9 @@ async def finalize_worker(
         )
         logger.info('Start to create folder trees')
 
-        s3_parts_info = await boto3_client.list_chunks(bucket, obj_path, resumable_identifier)
-        chunks_info = [
-            {'PartNumber': x.get('PartNumber'), 'ETag': x.get('ETag').replace("\"", '')}
-            for x in s3_parts_info.get('Parts', [])
-        ]
-
-        for retry_count in range(0, 3):
-            if len(chunks_info) != request_payload.resumable_total_chunks:
-                await asyncio.sleep(1 * retry_count)
-            else:
-                break
-
-        result = await boto3_client.combine_chunks(bucket, obj_path, resumable_identifier, chunks_info)
+        result, s3_parts = await combine_upload_parts(
+            boto3_client, bucket, obj_path, resumable_identifier, request_payload.resumable_total_chunks
+        )
         version_id = result.get('VersionId', '')
 
         logger.info('start to create item in metadata service')
@@ -616,12 +865,16 @@ async def finalize_worker(
             'tags': request_payload.tags,
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.put(
-                ConfigClass.METADATA_SERVICE + 'item/', params={'id': item_id}, json=data, timeout=10
-            )
-            if response.status_code != 200:
-                raise Exception('Fail to create metadata in postgres')
+        client = get_http_client()
+        response = await client.put(
+            ConfigClass.METADATA_SERVICE + 'item/',
+            params={'id': item_id},
+            json=data,
+            timeout=ConfigClass.METADATA_SERVICE_TIMEOUT,
+        )
+        if response.status_code != 200:
+            raise Exception('Fail to create metadata in postgres')
+        await add_existing_paths(project_code, 0 if namespace == 'greenroom' else 1, [f'{file_path}/{file_name}'])
 
         created_entity = response.json().get('result')
         file_id = item_id
@@ -631,15 +884,17 @@ async def finalize_worker(
 
         if archive_type:
             logger.info('Start to create archvie preview')
-            await boto3_client.download_object(bucket, obj_path, temp_dir + '/' + obj_path)
-
-            archive_preview = await generate_archive_preview(temp_dir + '/' + obj_path, archive_type)
-            payload = {
-                'archive_preview': archive_preview,
-                'file_id': file_id,
-            }
-            async with httpx.AsyncClient() as client:
-                await client.post(ConfigClass.DATAOPS_SERVICE + 'archive', json=payload, timeout=3600)
+            object_size = sum(x.get('Size', 0) for x in s3_parts) or int(request_payload.resumable_total_size)
+            archive_preview = await get_archive_preview(
+                boto3_client, bucket, obj_path, resumable_identifier, result.get('ETag', ''), archive_type, object_size
+            )
+            client = get_http_client()
+            await client.post(
+                ConfigClass.DATAOPS_SERVICE + 'archive',
+                content=iter_archive_payload(archive_preview, file_id),
+                headers={'Content-Type': 'application/json'},
+                timeout=3600,
+            )
 
         obj_path = (
             (ConfigClass.GREEN_ZONE_LABEL if namespace == 'greenroom' else ConfigClass.CORE_ZONE_LABEL) + '/' + obj_path
@@ -659,12 +914,6 @@ async def finalize_worker(
             username=operator,
             container_code=project_code,
         )
-    except FileNotFoundError as e:
-        error_msg = f'folder {temp_dir} is already empty: {str(e)}'
-        logger.error(error_msg)
-        status_mgr.add_payload('error_msg', str(error_msg))
-        await status_mgr.set_status(EFileStatus.FAILED)
-
     except Exception as exce:
         logger.audit(
             'Received an unexpected error while attempting to combine uploaded chunks.',
@@ -677,10 +926,6 @@ async def finalize_worker(
         await status_mgr.set_status(EFileStatus.FAILED)
         raise exce
 
-    finally:
-        if os.path.isdir(temp_dir):
-            shutil.rmtree(temp_dir)
-
 
 async def get_conflict_folder_paths(project_code: str, current_folder_node: str):
     """
@@ -698,19 +943,24 @@ async def get_conflict_folder_paths(project_code: str, current_folder_node: str)
     namespace = ConfigClass.namespace
 
     conflict_folder_paths = []
+    zone = 0 if namespace == 'greenroom' else 1
+    possible = await filter_possible_paths(project_code, zone, [current_folder_node])
+    if not possible[0]:
+        return conflict_folder_paths
+
     file_path, file_name = current_folder_node.rsplit('/', 1)
     params = {
         'parent_path': file_path,
         'name': file_name,
         'container_code': project_code,
         'status': ItemStatus.ACTIVE,
-        'zone': 0 if namespace == 'greenroom' else 1,
+        'zone': zone,
         'recursive': False,
     }
     # also check if it is in greeroom or core
     node_query_url = ConfigClass.METADATA_SERVICE + 'items/search/'
-    async with httpx.AsyncClient() as client:
-        response = await client.get(node_query_url, params=params)
+    client = get_http_client()
+    response = await client.get(node_query_url, params=params, timeout=ConfigClass.METADATA_SERVICE_TIMEOUT)
     nodes = response.json().get('result', [])
 
     if len(nodes) > 0:
@@ -719,11 +969,67 @@ async def get_conflict_folder_paths(project_code: str, current_folder_node: str)
     return conflict_folder_paths
 
 
+async def search_item_names(project_code: str, parent_path: str, names: set[str]) -> set[str]:
+    """
+    Summary:
+        The function returns which of the given names already exist as
+        active items directly under the parent path. Each name is looked up
+        by name, unless listing the whole directory takes fewer requests.
+        The size of directory is read with a single item page first.
+    Parameter:
+        project_code(string): The unique code of target project
+        parent_path(string): the folder where the names are checked
+        names(set): the names of files to check
+    Return:
+        set of names that already exist
+    """
+    params = {
+        'parent_path': parent_path,
+        'container_code': project_code,
+        'status': ItemStatus.ACTIVE,
+        'zone': 0 if ConfigClass.namespace == 'greenroom' else 1,
+        'recursive': False,
+    }
+    node_query_url = ConfigClass.METADATA_SERVICE + 'items/search/'
+    client = get_http_client()
+
+    async def search(**extra) -> dict:
+        response = await client.get(
+            node_query_url, params={**params, **extra}, timeout=ConfigClass.METADATA_SERVICE_TIMEOUT
+        )
+        return response.json()
+
+    existing = set()
+    if len(names) > 1:
+        page_size = ConfigClass.METADATA_SEARCH_PAGE_SIZE
+        total = (await search(page_size=1, page=0)).get('total', 0)
+        num_of_pages = -(-total // page_size)
+        if num_of_pages < len(names):
+            for page in range(num_of_pages):
+                payload = await search(page_size=page_size, page=page)
+                existing.update(node.get('name') for node in payload.get('result', []))
+            return existing & names
+
+    semaphore = asyncio.Semaphore(ConfigClass.METADATA_SEARCH_CONCURRENCY)
+
+    async def search_name(name: str) -> dict:
+        async with semaphore:
+            return await search(name=name)
+
+    results = await asyncio.gather(*[search_name(name) for name in names])
+    for payload in results:
+        existing.update(node.get('name') for node in payload.get('result', []))
+
+    return existing & names
+
+
 async def get_conflict_file_paths(data, project_code):
     """
     Summary:
         The function will check and return conflict file paths for
-        file upload only.
+        file upload only. The files which are definitely new according to
+        the path filter are skipped. The rest are grouped by their folder so
+        the metadata service is queried once per folder instead of once per file.
     Parameter:
         data(list of dict):
             - resumable_filename(string): the name of file
@@ -734,25 +1040,30 @@ async def get_conflict_file_paths(data, project_code):
             - display_path(string): the path of conflict file
             - type(string): File
     """
-    namespace = ConfigClass.namespace
-    conflict_file_paths = []
+    zone = 0 if ConfigClass.namespace == 'greenroom' else 1
+    possible = await filter_possible_paths(
+        project_code, zone, [f'{x.resumable_relative_path}/{x.resumable_filename}' for x in data]
+    )
+    # only the files which may exist have to be checked by metadata service
+    data = [upload_data for upload_data, may_exist in zip(data, possible) if may_exist]
+
+    folders = {}
     for upload_data in data:
-        params = {
-            'parent_path': upload_data.resumable_relative_path,
-            'name': upload_data.resumable_filename,
-            'container_code': project_code,
-            'status': ItemStatus.ACTIVE,
-            'zone': 0 if namespace == 'greenroom' else 1,
-            'recursive': False,
-        }
+        folders.setdefault(upload_data.resumable_relative_path, set()).add(upload_data.resumable_filename)
+
+    semaphore = asyncio.Semaphore(ConfigClass.METADATA_SEARCH_CONCURRENCY)
+
+    async def search(parent_path: str, names: set[str]) -> set[str]:
+        async with semaphore:
+            return await search_item_names(project_code, parent_path, names)
 
-        # search upto the new metadata service if the input files
-        node_query_url = ConfigClass.METADATA_SERVICE + 'items/search/'
-        async with httpx.AsyncClient() as client:
-            response = await client.get(node_query_url, params=params)
-        nodes = response.json().get('result', [])
+    parent_paths = list(folders)
+    results = await asyncio.gather(*[search(parent_path, folders[parent_path]) for parent_path in parent_paths])
+    existing = dict(zip(parent_paths, results))
 
-        if len(nodes) > 0:
+    conflict_file_paths = []
+    for upload_data in data:
+        if upload_data.resumable_filename in existing[upload_data.resumable_relative_path]:
             conflict_file_paths.append(
                 {
                     'name': upload_data.resumable_filename,
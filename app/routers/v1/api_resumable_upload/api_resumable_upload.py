@@ -4,19 +4,23 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
-import asyncio
+import json
+from typing import AsyncIterator
 
-from common.object_storage_adaptor.boto3_client import get_boto3_client
+from common.object_storage_adaptor.boto3_client import Boto3Client
 from fastapi import APIRouter
+from fastapi import Depends
+from fastapi.responses import StreamingResponse
 from fastapi_utils import cbv
 
-from app.config import ConfigClass
+from app.commons.registry import get_internal_boto3_client
 from app.logger import logger
 from app.models.base_models import APIResponse
 from app.models.models_resumable_upload import ResumableUploadPOST
 from app.models.models_resumable_upload import ResumableUploadResponse
 from app.routers.exceptions import NotFound
 from app.routers.v1.api_resumable_upload.utils import get_chunks_info
+from app.routers.v1.api_resumable_upload.utils import iter_chunks_info
 
 router = APIRouter()
 
@@ -28,31 +32,7 @@ class APIResumableUpload:
         this is the api related to resume multipart upload
     """
 
-    def __init__(self):
-        self.boto3_client = self._connect_to_object_storage()
-
-    def _connect_to_object_storage(self):
-        loop = asyncio.new_event_loop()
-
-        logger.info('Initialize the boto3 client')
-        try:
-            boto3_client = loop.run_until_complete(
-                get_boto3_client(
-                    ConfigClass.S3_INTERNAL,
-                    access_key=ConfigClass.S3_ACCESS_KEY,
-                    secret_key=ConfigClass.S3_SECRET_KEY,
-                    https=ConfigClass.S3_INTERNAL_HTTPS,
-                )
-            )
-            boto3_client._config.max_pool_connections = 1000
-            logger.warning(f'temporary increase the boto3 connections to {boto3_client._config.max_pool_connections}')
-
-        except Exception:
-            logger.exception('Fail to create connection with boto3')
-            raise
-
-        loop.close()
-        return boto3_client
+    boto3_client: Boto3Client = Depends(get_internal_boto3_client)
 
     @router.post(
         '/files/resumable',
@@ -62,6 +42,7 @@ class APIResumableUpload:
     async def resumable_upload(
         self,
         request_payload: ResumableUploadPOST,
+        stream: bool = False,
     ):
         """
         Summary:
@@ -72,12 +53,19 @@ class APIResumableUpload:
             - object_infos(List[ObjectInfo]): the list of pairs contains following:
                 - object_path(str): the unique path in object storage
                 - resumable_id(str): the unique identifier for resumable upload
+        Query:
+            - stream(bool): return each object as a line of NDJSON as soon as
+                its parts are listed instead of one response at the end
         return:
             - result(list):
                 - object_path(str): the unique path in object storage
                 - resumable_id(str): the unique identifier for resumable upload
                 - chunks_info(dict[str: str]): the pair of chunk_number: etag
         """
+        if stream:
+            chunks_info = iter_chunks_info(self.boto3_client, request_payload.bucket, request_payload.object_infos)
+            return StreamingResponse(ndjson_lines(chunks_info), media_type='application/x-ndjson')
+
         api_response = APIResponse()
 
         try:
@@ -88,3 +76,14 @@ class APIResumableUpload:
             raise NotFound(str(e))
 
         return api_response.json_response()
+
+
+async def ndjson_lines(chunks_info: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """Serialize the chunks info as NDJSON, the failure is reported as the last line."""
+
+    try:
+        async for chunk_info in chunks_info:
+            yield json.dumps(chunk_info) + '\n'
+    except Exception as e:
+        logger.exception('An exception occurred while retrieving the uploaded parts')
+        yield json.dumps({'error': NotFound(str(e)).dict()}) + '\n'
@@ -4,34 +4,84 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
+import asyncio
+import random
+from typing import AsyncIterator
+
 import botocore.exceptions
 
+from app.commons.data_providers.redis_part_tracker import get_uploaded_parts
+from app.commons.object_storage import list_all_parts
+from app.config import ConfigClass
 from app.logger import logger
 from app.models.models_resumable_upload import ObjectInfo
 
 
-async def get_chunks_info(boto3_client, bucket, object_infos: list[ObjectInfo]) -> list[dict]:
-    result = []
-    for obj_info in object_infos:
-        try:
-            s3_parts_res = await boto3_client.list_chunks(bucket, obj_info.object_path, obj_info.resumable_id)
-        except botocore.exceptions.ClientError as e:
-            if e.response['Error']['Code'] == 'NoSuchUpload':
-                logger.warning(
-                    f'Upload for object "{obj_info.object_path}" '
-                    f'with upload ID "{obj_info.resumable_id}" does not exist.'
-                )
-                continue
-            raise
-
-        s3_parts_info = {x.get('PartNumber'): x.get('ETag').replace("\"", '') for x in s3_parts_res.get('Parts', [])}
-
-        result.append(
-            {
-                'object_path': obj_info.object_path,
-                'resumable_id': obj_info.resumable_id,
-                'chunks_info': s3_parts_info,
-            }
-        )
-
-    return result
+async def get_chunk_info(boto3_client, bucket, obj_info: ObjectInfo) -> dict | None:
+    """Get the uploaded parts of one object or None if the upload does not exist."""
+
+    # the parts uploaded through the chunk upload api are recorded, so they are not listed again
+    s3_parts = await get_uploaded_parts(obj_info.resumable_id)
+    if s3_parts and random.random() >= ConfigClass.PART_LEDGER_VERIFY_RATE:
+        return {
+            'object_path': obj_info.object_path,
+            'resumable_id': obj_info.resumable_id,
+            'chunks_info': {x['PartNumber']: x['ETag'] for x in s3_parts},
+        }
+
+    try:
+        s3_parts = await list_all_parts(boto3_client, bucket, obj_info.object_path, obj_info.resumable_id)
+    except botocore.exceptions.ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchUpload':
+            logger.warning(
+                f'Upload for object "{obj_info.object_path}" '
+                f'with upload ID "{obj_info.resumable_id}" does not exist.'
+            )
+            return None
+        raise
+
+    s3_parts_info = {x.get('PartNumber'): x.get('ETag').replace("\"", '') for x in s3_parts}
+
+    return {
+        'object_path': obj_info.object_path,
+        'resumable_id': obj_info.resumable_id,
+        'chunks_info': s3_parts_info,
+    }
+
+
+def _bounded(boto3_client, bucket, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(obj_info: ObjectInfo) -> dict | None:
+        async with semaphore:
+            return await get_chunk_info(boto3_client, bucket, obj_info)
+
+    return fetch
+
+
+async def get_chunks_info(
+    boto3_client, bucket, object_infos: list[ObjectInfo], concurrency: int = ConfigClass.RESUMABLE_LIST_CONCURRENCY
+) -> list[dict]:
+    """List the uploaded parts of all the objects concurrently and keep the input order."""
+
+    fetch = _bounded(boto3_client, bucket, concurrency)
+    result = await asyncio.gather(*[fetch(obj_info) for obj_info in object_infos])
+
+    return [chunk_info for chunk_info in result if chunk_info is not None]
+
+
+async def iter_chunks_info(
+    boto3_client, bucket, object_infos: list[ObjectInfo], concurrency: int = ConfigClass.RESUMABLE_LIST_CONCURRENCY
+) -> AsyncIterator[dict]:
+    """List the uploaded parts of all the objects concurrently and yield them as each one completes."""
+
+    fetch = _bounded(boto3_client, bucket, concurrency)
+    tasks = [asyncio.create_task(fetch(obj_info)) for obj_info in object_infos]
+    try:
+        for task in asyncio.as_completed(tasks):
+            chunk_info = await task
+            if chunk_info is not None:
+                yield chunk_info
+    finally:
+        for task in tasks:
+            task.cancel()
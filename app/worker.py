@@ -0,0 +1,51 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+import signal
+
+from app.commons.finalize_queue import finalize_queue
+from app.commons.registry import client_registry
+from app.config import ConfigClass
+from app.logger import logger
+from app.main import setup_logging
+from app.resources.preview_pool import preview_pool
+from app.routers.v1.api_data_upload import run_finalize_job
+
+
+async def run_worker(stop: asyncio.Event | None = None) -> None:
+    """
+    Summary:
+        The function runs the finalize jobs from the finalize queue without
+        the http server, so the combine, metadata and preview work does not
+        share the event loop and thread pool with the chunk uploads. The
+        worker stops on SIGTERM or SIGINT after the running jobs are done,
+        the jobs which are not started yet stay in the queue.
+    Parameter:
+        - stop(asyncio.Event): the event to stop the worker, by default it
+            is set by the termination signals
+    """
+
+    setup_logging(ConfigClass)
+
+    if stop is None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+
+    await client_registry.init_connection()
+    await client_registry.connect_kafka()
+    finalize_queue.start(run_finalize_job)
+    logger.info('Finalize worker started')
+
+    try:
+        await stop.wait()
+    finally:
+        logger.info('Finalize worker is stopping')
+        await finalize_queue.stop()
+        await client_registry.close_connection()
+        preview_pool.shutdown()
@@ -0,0 +1,46 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import io
+import zipfile
+
+from app.commons.archive_index import EdgeCapture
+from app.commons.object_storage import RangedObjectReader
+from app.resources.helpers import read_zip
+
+
+async def iterate(pieces):
+    for piece in pieces:
+        yield piece
+
+
+async def test_edge_capture_keeps_head_and_tail_across_pieces():
+    capture = EdgeCapture(iterate([b'abc', b'defgh', b'ij']), head_size=4, tail_size=6)
+
+    pieces = [piece async for piece in capture]
+
+    assert pieces == [b'abc', b'defgh', b'ij']
+    assert capture.head == b'abcd'
+    assert capture.tail == b'efghij'
+
+
+async def test_archive_preview_is_built_from_captured_edges_without_requests():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr('folder/large.bin', b'0' * 512 * 1024)
+        archive.writestr('folder/small.txt', b'content')
+    content = buffer.getvalue()
+    capture = EdgeCapture(iterate([content]), head_size=16 * 1024, tail_size=16 * 1024)
+    _ = [piece async for piece in capture]
+
+    with RangedObjectReader('http://s3_internal/download', size=len(content)) as reader:
+        reader.preload(0, capture.head)
+        reader.preload(len(content) - len(capture.tail), capture.tail)
+        preview = read_zip(reader).get_structure()
+
+        assert reader.requests == 0
+
+    assert preview['folder']['small.txt'] == {'filename': 'small.txt', 'size': 7, 'is_dir': False}
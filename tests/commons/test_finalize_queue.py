@@ -0,0 +1,72 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+import json
+
+import pytest
+
+from app.commons.finalize_queue import FinalizeQueue
+
+
+@pytest.fixture(autouse=True)
+def enable_finalize_queue(monkeypatch):
+    monkeypatch.setattr('app.commons.finalize_queue.ConfigClass.FINALIZE_QUEUE_ENABLED', True)
+    monkeypatch.setattr('app.commons.finalize_queue.ConfigClass.FINALIZE_QUEUE_BLOCK_TIME', 10)
+
+
+async def wait_until(condition) -> None:
+    for _ in range(500):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('condition is not met')
+
+
+async def test_finalize_queue_runs_jobs_with_bounded_concurrency(fake_redis):
+    queue = FinalizeQueue(stream='finalize', group='group', concurrency=2)
+    running, peak, done = set(), [], []
+
+    async def handler(job: dict) -> None:
+        running.add(job['id'])
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.discard(job['id'])
+        done.append(job['id'])
+
+    for index in range(10):
+        await queue.enqueue({'id': index})
+    queue.start(handler)
+    await wait_until(lambda: len(done) == 10)
+    usage = await queue.usage()
+    await queue.stop()
+
+    assert sorted(done) == list(range(10))
+    assert max(peak) == 2
+    assert usage['depth'] == 0
+    assert usage['pending'] == 0
+    assert usage['succeeded'] == 10
+
+
+async def test_finalize_queue_retries_failed_job_then_moves_it_to_dead_stream(fake_redis):
+    queue = FinalizeQueue(stream='finalize', group='group', concurrency=1, max_attempts=3, retry_delay=0)
+    attempts = []
+
+    async def handler(job: dict) -> None:
+        attempts.append(job)
+        raise Exception('fail to combine chunks')
+
+    await queue.enqueue({'id': 'job'})
+    queue.start(handler)
+    await wait_until(lambda: queue.stats.dead == 1)
+    await queue.stop()
+
+    assert len(attempts) == 3
+    assert queue.stats.retried == 2
+    assert queue.stats.claimed == 0
+    assert fake_redis.streams['finalize'] == {}
+    dead_entry = list(fake_redis.streams['finalize:dead'].values())[0]
+    assert json.loads(dead_entry[b'job']) == {'id': 'job'}
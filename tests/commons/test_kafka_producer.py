@@ -0,0 +1,162 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+import io
+import os
+from datetime import datetime
+from datetime import timezone
+from unittest import mock
+from uuid import uuid4
+
+import pytest
+from fastavro import schemaless_reader
+
+from app.commons.kafka_producer import KakfaProducer
+from app.commons.kafka_spool import MessageSpool
+from app.commons.kafka_spool import SpoolFullError
+
+
+async def test_validate_message_reuses_parsed_schema_and_buffer(mocker):
+    producer = KakfaProducer()
+    producer.load_schemas()
+    load_schema = mocker.patch('app.commons.kafka_producer.schema.load_schema')
+    schema_name = 'metadata.items.activity.avsc'
+    messages = [
+        {
+            'activity_type': 'upload',
+            'activity_time': datetime.now(tz=timezone.utc),
+            'item_id': item_id,
+            'item_type': 'file',
+            'item_name': name,
+            'item_parent_path': 'admin',
+            'container_code': 'project',
+            'container_type': 'project',
+            'zone': 0,
+            'user': 'admin',
+            'imported_from': '',
+            'changes': [],
+            'network_origin': 'unknown',
+        }
+        for item_id, name in [(str(uuid4()), 'long-file-name.txt'), (str(uuid4()), 'a')]
+    ]
+
+    encoded = [await producer._validate_message(schema_name, message) for message in messages]
+
+    load_schema.assert_not_called()
+    for content, message in zip(encoded, messages):
+        decoded = schemaless_reader(io.BytesIO(content), producer.get_schema(schema_name))
+        assert decoded['item_name'] == message['item_name']
+
+
+class FakeAIOKafkaProducer:
+    def __init__(self) -> None:
+        self.futures = []
+        self.flushed = False
+
+    async def send(self, topic, content):
+        future = asyncio.get_running_loop().create_future()
+        self.futures.append(future)
+        return future
+
+    async def flush(self):
+        self.flushed = True
+        self.futures[0].set_result('metadata')
+        self.futures[1].set_exception(Exception('broker is down'))
+
+
+@pytest.fixture
+def producer(tmp_path):
+    producer = KakfaProducer()
+    producer.spool = MessageSpool(str(tmp_path), 1024)
+    return producer
+
+
+async def test_send_message_tracks_delivery_without_waiting_for_broker(producer):
+    producer.producer = FakeAIOKafkaProducer()
+    producer.connected = True
+
+    await producer._send_message('topic', b'first')
+    await producer._send_message('topic', b'second')
+
+    assert producer.stats.sent == 2
+    assert producer.stats.pending == 2
+
+    await producer.flush()
+
+    assert producer.producer.flushed
+    assert producer.stats.delivered == 1
+    assert producer.stats.failed == 1
+    assert producer.stats.pending == 0
+    assert producer.stats.spooled == 1
+
+
+async def test_spooled_messages_are_replayed_once_kafka_is_back(producer):
+    await producer._send_message('topic', b'first')
+    await producer._send_message('topic', b'second')
+
+    assert producer.stats.spooled == 2
+    assert producer.stats.spool_bytes == len(b'topic\nfirst') + len(b'topic\nsecond')
+
+    producer.producer = mock.AsyncMock()
+    producer.connected = True
+    await producer.replay_spool()
+
+    assert producer.producer.send_and_wait.call_args_list == [
+        mock.call('topic', b'first'),
+        mock.call('topic', b'second'),
+    ]
+    assert producer.stats.replayed == 2
+    assert producer.stats.spool_bytes == 0
+    assert await producer.spool.list() == []
+
+
+async def test_send_message_raises_when_spool_is_full(producer):
+    producer.spool.max_bytes = 10
+
+    with pytest.raises(SpoolFullError):
+        await producer._send_message('topic', b'message is too long')
+
+    assert producer.stats.rejected == 1
+
+
+async def test_init_connection_stops_failed_producer_and_backs_off(producer, mocker):
+    aiokafka_producer = mocker.patch('app.commons.kafka_producer.AIOKafkaProducer')
+    aiokafka_producer.return_value.start = mock.AsyncMock(side_effect=Exception('broker is down'))
+    aiokafka_producer.return_value.stop = mock.AsyncMock()
+    mocker.patch.object(producer, '_drain_spool', mock.AsyncMock())
+
+    await producer.init_connection()
+    await producer.init_connection()
+
+    assert aiokafka_producer.call_count == 1
+    aiokafka_producer.return_value.stop.assert_awaited_once()
+    assert producer.producer is None
+    assert not producer.connected
+
+    producer._reconnect_at = 0
+    await producer.init_connection()
+
+    assert aiokafka_producer.call_count == 2
+
+
+async def test_spool_replays_only_own_and_orphaned_messages(tmp_path):
+    spool = MessageSpool(str(tmp_path), 1024)
+    await spool.append('topic', b'own')
+    # the parent process is alive, its message is left to it
+    alive = tmp_path / str(os.getppid())
+    alive.mkdir()
+    (alive / '1-alive.msg').write_bytes(b'topic\nalive')
+    gone = tmp_path / '999999999'
+    gone.mkdir()
+    (gone / '0-gone.msg').write_bytes(b'topic\ngone')
+
+    messages = [await spool.read(path) for path in await spool.list()]
+
+    assert messages == [('topic', b'gone'), ('topic', b'own')]
+    assert spool.size == len(b'topic\nown') + len(b'topic\ngone')
+    assert (alive / '1-alive.msg').exists()
+    assert not gone.exists()
@@ -0,0 +1,136 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import io
+import os
+import pickle
+import zipfile
+
+import pytest
+
+from app.commons.object_storage import BoundedPartStream
+from app.commons.object_storage import RangedObjectReader
+from app.commons.object_storage import list_all_parts
+from app.commons.object_storage import stream_part_upload
+from app.commons.registry import ClientRegistry
+from app.resources.helpers import read_zip
+
+
+async def iterate(pieces):
+    for piece in pieces:
+        yield piece
+
+
+async def test_bounded_part_stream_regroups_pieces_into_blocks():
+    stream = BoundedPartStream(iterate([b'a' * 3, b'b' * 3, b'c' * 3, b'd']), block_size=4)
+
+    blocks = [block async for block in stream]
+
+    assert blocks == [b'aaabbb', b'cccd']
+    assert stream.sent_bytes == 10
+    assert stream.peak_buffer_bytes == 6
+
+
+async def test_stream_part_upload_sends_content_with_length(httpx_mock, mocker):
+    boto3_client = mocker.Mock(generate_presigned_url=mocker.AsyncMock(return_value='http://s3_internal/presigned'))
+    httpx_mock.add_response(method='PUT', url='http://s3_internal/presigned', headers={'ETag': '"etag"'})
+
+    result = await stream_part_upload(boto3_client, 'bucket', 'key', 'upload-id', 2, iterate([b'x' * 5]), 5)
+
+    request = httpx_mock.get_request()
+    assert request.headers['Content-Length'] == '5'
+    assert 'Transfer-Encoding' not in request.headers
+    assert await request.aread() == b'xxxxx'
+    assert result == {'ETag': 'etag', 'PartNumber': 2}
+
+
+async def test_stream_part_upload_raises_when_etag_is_missing(httpx_mock, mocker):
+    boto3_client = mocker.Mock(generate_presigned_url=mocker.AsyncMock(return_value='http://s3_internal/presigned'))
+    httpx_mock.add_response(method='PUT', url='http://s3_internal/presigned')
+
+    with pytest.raises(Exception, match='chunk 3: the response has no ETag'):
+        await stream_part_upload(boto3_client, 'bucket', 'key', 'upload-id', 3, iterate([b'x']), 1)
+
+
+async def test_stream_part_upload_does_not_hold_shared_service_connections(httpx_mock, mocker):
+    registry = ClientRegistry()
+    mocker.patch('app.commons.registry.client_registry', registry)
+    boto3_client = mocker.Mock(generate_presigned_url=mocker.AsyncMock(return_value='http://s3_internal/presigned'))
+    httpx_mock.add_response(method='PUT', url='http://s3_internal/presigned', headers={'ETag': '"etag"'})
+
+    await stream_part_upload(boto3_client, 'bucket', 'key', 'upload-id', 1, iterate([b'x']), 1)
+
+    assert registry.get_object_storage_pool_usage()['requests'] == 1
+    assert registry.http_client is None
+    await registry.close_connection()
+
+
+class FakeObjectStorageClient:
+    def __init__(self, part_numbers: list[int]) -> None:
+        self.part_numbers = part_numbers
+        self.markers = []
+
+    async def list_parts(self, bucket, key, upload_id, max_parts, part_number_marker):
+        self.markers.append(part_number_marker)
+        after = [number for number in self.part_numbers if number > part_number_marker]
+        page = after[:max_parts]
+        response = {'Parts': [{'PartNumber': number, 'ETag': f'"{number}"'} for number in page]}
+        response['IsTruncated'] = len(after) > max_parts
+        if response['IsTruncated']:
+            response['NextPartNumberMarker'] = page[-1]
+        return response
+
+
+@pytest.mark.parametrize('expected_parts', [None, 25])
+async def test_list_all_parts_follows_every_page(mocker, expected_parts):
+    mocker.patch('app.commons.object_storage.ConfigClass.S3_LIST_PARTS_PAGE_SIZE', 10)
+    boto3_client = FakeObjectStorageClient(list(range(1, 26)))
+
+    parts = await list_all_parts(boto3_client, 'bucket', 'key', 'upload-id', expected_parts)
+
+    assert [part['PartNumber'] for part in parts] == list(range(1, 26))
+    assert sorted(boto3_client.markers) == [0, 10, 20]
+
+
+@pytest.fixture
+def large_zip() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr('folder/large.bin', os.urandom(2 * 1024 * 1024))
+        archive.writestr('folder/small.txt', b'content')
+    return buffer.getvalue()
+
+
+def test_ranged_object_reader_previews_zip_without_reading_whole_object(mock_ranged_download, large_zip):
+    mock_ranged_download(large_zip)
+
+    with RangedObjectReader('http://s3_internal/download', block_size=16 * 1024, read_ahead=1) as reader:
+        preview = read_zip(reader).get_structure()
+
+        assert reader.size == len(large_zip)
+        assert reader.fetched_bytes < len(large_zip) // 10
+
+    assert preview == {
+        'folder': {
+            'is_dir': True,
+            'large.bin': {'filename': 'large.bin', 'size': 2 * 1024 * 1024, 'is_dir': False},
+            'small.txt': {'filename': 'small.txt', 'size': 7, 'is_dir': False},
+        }
+    }
+
+
+def test_ranged_object_reader_can_be_pickled_and_reads_again(mock_ranged_download):
+    content = bytes(range(256)) * 10
+    mock_ranged_download(content)
+    reader = RangedObjectReader('http://s3_internal/download', block_size=100, read_ahead=2)
+    assert reader.read(10) == content[:10]
+
+    copied = pickle.loads(pickle.dumps(reader))
+
+    assert copied.tell() == 10
+    assert copied.read(300) == content[10:310]
+    copied.seek(-5, io.SEEK_END)
+    assert copied.read() == content[-5:]
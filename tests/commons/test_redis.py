@@ -0,0 +1,34 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import pytest
+
+from app.commons.data_providers.redis import SrvAioRedisSingleton
+
+
+@pytest.fixture
+def prefixed_keys(fake_redis):
+    fake_redis.data.update({f'prefix:{index}': str(index).encode() for index in range(5)})
+    fake_redis.data['other:1'] = b'other'
+    return fake_redis
+
+
+async def test_iter_by_prefix_streams_values_in_batches(prefixed_keys, mocker):
+    mget = mocker.spy(prefixed_keys, 'mget')
+
+    pairs = [pair async for pair in SrvAioRedisSingleton().iter_by_prefix('prefix', count=2)]
+
+    assert sorted(value for _, value in pairs) == [b'0', b'1', b'2', b'3', b'4']
+    assert mget.call_count == 3
+
+
+async def test_mdelete_by_prefix_unlinks_keys_in_batches(prefixed_keys, mocker):
+    unlink = mocker.spy(prefixed_keys, 'unlink')
+
+    await SrvAioRedisSingleton().mdelete_by_prefix('prefix', count=2)
+
+    assert prefixed_keys.data == {'other:1': b'other'}
+    assert unlink.call_count == 3
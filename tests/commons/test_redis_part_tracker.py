@@ -0,0 +1,57 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+import time
+
+from app.commons.data_providers.redis_part_tracker import clear_uploaded_parts
+from app.commons.data_providers.redis_part_tracker import get_uploaded_parts
+from app.commons.data_providers.redis_part_tracker import record_uploaded_part
+from app.commons.data_providers.redis_part_tracker import wait_for_uploaded_parts
+
+
+async def test_wait_for_uploaded_parts_returns_when_last_part_is_recorded(fake_redis):
+    await record_uploaded_part('upload_id', 1, 'etag1', 10)
+
+    async def upload_last_part():
+        await asyncio.sleep(0.05)
+        await record_uploaded_part('upload_id', 2, 'etag2', 5)
+
+    start = time.time()
+    task = asyncio.create_task(upload_last_part())
+    assert await wait_for_uploaded_parts('upload_id', 2, timeout=5) is True
+    await task
+
+    assert time.time() - start < 0.5
+    assert fake_redis.subscribers['upload:parts:upload_id:uploaded'] == []
+
+
+async def test_wait_for_uploaded_parts_stops_at_deadline(fake_redis):
+    await record_uploaded_part('upload_id', 1, 'etag1', 10)
+
+    assert await wait_for_uploaded_parts('upload_id', 2, timeout=0.05) is False
+
+
+async def test_wait_for_uploaded_parts_skips_upload_without_recorded_parts(fake_redis):
+    start = time.time()
+
+    assert await wait_for_uploaded_parts('upload_id', 2, timeout=5) is False
+    assert time.time() - start < 0.5
+
+
+async def test_get_uploaded_parts_returns_recorded_parts_in_order(fake_redis):
+    await record_uploaded_part('upload_id', 10, 'etag10', 5)
+    await record_uploaded_part('upload_id', 2, 'etag2', 10)
+    await record_uploaded_part('upload_id', 2, 'etag2-again', 10)
+
+    assert await get_uploaded_parts('upload_id') == [
+        {'PartNumber': 2, 'ETag': 'etag2-again', 'Size': 10},
+        {'PartNumber': 10, 'ETag': 'etag10', 'Size': 5},
+    ]
+
+    await clear_uploaded_parts('upload_id')
+
+    assert await get_uploaded_parts('upload_id') == []
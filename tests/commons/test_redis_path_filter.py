@@ -0,0 +1,65 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+import re
+
+import pytest
+
+from app.commons.data_providers.redis_path_filter import _build_tasks
+from app.commons.data_providers.redis_path_filter import add_existing_paths
+from app.commons.data_providers.redis_path_filter import filter_possible_paths
+
+
+@pytest.fixture(autouse=True)
+def enable_path_filter(monkeypatch):
+    monkeypatch.setattr('app.commons.data_providers.redis_path_filter.ConfigClass.PATH_FILTER_ENABLED', True)
+
+
+async def test_filter_possible_paths_checks_everything_until_filter_is_built(fake_redis, httpx_mock):
+    httpx_mock.add_response(
+        method='GET',
+        url=re.compile(r'.*items/search/.*page=0$'),
+        json={'result': [{'parent_path': 'admin', 'name': 'a.txt'}], 'num_of_pages': 1},
+    )
+
+    assert await filter_possible_paths('project', 1, ['admin/a.txt', 'admin/b.txt']) == [True, True]
+
+    await asyncio.gather(*_build_tasks)
+    await add_existing_paths('project', 1, ['admin/c.txt'])
+
+    result = await filter_possible_paths('project', 1, ['admin/a.txt', 'admin/b.txt', 'admin/c.txt'])
+    assert result == [True, False, True]
+    assert 'upload:path_filter:project:1:building' not in fake_redis.data
+
+
+async def test_filter_possible_paths_rebuilds_expired_filter_from_scratch(fake_redis, httpx_mock):
+    httpx_mock.add_response(
+        method='GET',
+        url=re.compile(r'.*items/search/.*page=0$'),
+        json={'result': [{'parent_path': 'admin', 'name': 'a.txt'}], 'num_of_pages': 1},
+    )
+    await filter_possible_paths('project', 1, ['admin/a.txt'])
+    await asyncio.gather(*_build_tasks)
+    # the ready marker expires and the item is moved away by another service
+    fake_redis.data.pop('upload:path_filter:project:1:ready')
+    httpx_mock.add_response(
+        method='GET',
+        url=re.compile(r'.*items/search/.*page=0$'),
+        json={'result': [{'parent_path': 'admin', 'name': 'b.txt'}], 'num_of_pages': 1},
+    )
+
+    assert await filter_possible_paths('project', 1, ['admin/a.txt', 'admin/b.txt']) == [True, True]
+
+    await asyncio.gather(*_build_tasks)
+    assert await filter_possible_paths('project', 1, ['admin/a.txt', 'admin/b.txt']) == [False, True]
+
+
+async def test_filter_possible_paths_is_skipped_when_disabled(fake_redis, monkeypatch):
+    monkeypatch.setattr('app.commons.data_providers.redis_path_filter.ConfigClass.PATH_FILTER_ENABLED', False)
+    fake_redis.data['upload:path_filter:project:1:ready'] = '1'
+
+    assert await filter_possible_paths('project', 1, ['admin/a.txt']) == [True]
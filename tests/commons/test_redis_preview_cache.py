@@ -0,0 +1,94 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import pytest
+
+from app.commons.data_providers.redis_preview_cache import cache_archive_preview
+from app.commons.data_providers.redis_preview_cache import get_cached_archive_preview
+from app.resources.helpers import Archive
+from app.resources.helpers import ArchiveFile
+
+
+class FakeFile(ArchiveFile):
+    def __init__(self, name: str, is_dir: bool = False, size: int = 1) -> None:
+        self._name = name
+        self._is_dir = is_dir
+        self._size = size
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def is_dir(self) -> bool:
+        return self._is_dir
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+
+@pytest.fixture(autouse=True)
+def enable_preview_cache(monkeypatch):
+    monkeypatch.setattr(
+        'app.commons.data_providers.redis_preview_cache.ConfigClass.ARCHIVE_PREVIEW_CACHE_ENABLED', True
+    )
+
+
+def get_archive(name: str) -> Archive:
+    archive = Archive()
+    archive.add(FakeFile(f'folder/{name}', size=10))
+    archive.add(FakeFile('folder/sub', is_dir=True, size=0))
+    return archive
+
+
+async def test_cached_archive_preview_is_returned_for_same_etag(fake_redis):
+    await cache_archive_preview('etag-1', get_archive('a.txt'))
+
+    archive = await get_cached_archive_preview('etag-1')
+
+    assert archive.get_structure() == get_archive('a.txt').get_structure()
+    assert await get_cached_archive_preview('etag-2') is None
+
+
+async def test_cache_archive_preview_evicts_least_recently_used(fake_redis, monkeypatch):
+    sizes = {name: len(get_archive(name).dump()) for name in ['a.txt', 'b.txt', 'c.txt']}
+    monkeypatch.setattr(
+        'app.commons.data_providers.redis_preview_cache.ConfigClass.ARCHIVE_PREVIEW_CACHE_MAX_BYTES',
+        max(sizes.values()) * 2,
+    )
+
+    await cache_archive_preview('etag-1', get_archive('a.txt'))
+    await cache_archive_preview('etag-2', get_archive('b.txt'))
+    await get_cached_archive_preview('etag-1')
+    await cache_archive_preview('etag-3', get_archive('c.txt'))
+
+    assert await get_cached_archive_preview('etag-2') is None
+    assert await get_cached_archive_preview('etag-1') is not None
+    assert await get_cached_archive_preview('etag-3') is not None
+    assert fake_redis.data['upload:archive_preview:lru:bytes'] == sizes['a.txt'] + sizes['c.txt']
+
+
+async def test_cache_archive_preview_skips_large_preview(fake_redis, monkeypatch):
+    monkeypatch.setattr(
+        'app.commons.data_providers.redis_preview_cache.ConfigClass.ARCHIVE_PREVIEW_CACHE_MAX_ENTRY_BYTES', 1
+    )
+
+    await cache_archive_preview('etag-1', get_archive('a.txt'))
+
+    assert await get_cached_archive_preview('etag-1') is None
+
+
+async def test_cache_archive_preview_skips_failed_preview(fake_redis):
+    await cache_archive_preview('etag-1', Archive.from_marker('Error: The archive preview exceeds the time limit'))
+
+    assert await get_cached_archive_preview('etag-1') is None
+
+
+async def test_get_cached_archive_preview_returns_none_when_redis_fails(fake_redis, mocker):
+    mocker.patch.object(fake_redis, 'get', side_effect=ConnectionError('redis is down'))
+
+    assert await get_cached_archive_preview('etag-1') is None
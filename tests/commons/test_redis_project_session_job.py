@@ -0,0 +1,28 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import json
+
+from app.commons.data_providers.redis_project_session_job import EFileStatus
+from app.commons.data_providers.redis_project_session_job import SessionJob
+from app.commons.data_providers.redis_project_session_job import session_job_bulk_save
+
+
+async def test_session_job_bulk_save_writes_every_job_in_order(httpx_mock, fake):
+    httpx_mock.add_response(method='POST', url='http://dataops_service/v1/task-stream/', json={})
+    jobs = []
+    for _ in range(5):
+        job = SessionJob('1234', fake.project_code(), 'me', fake.uuid4())
+        job.set_source([fake.file_path(depth=2)])
+        await job.set_status(EFileStatus.RUNNING, save=False)
+        jobs.append(job)
+
+    results = await session_job_bulk_save(jobs, batch_size=2, concurrency=2)
+
+    assert [result['job_id'] for result in results] == [job.job_id for job in jobs]
+    requests = httpx_mock.get_requests()
+    assert len(requests) == 5
+    assert {json.loads(request.read())['status'] for request in requests} == {'RUNNING'}
@@ -0,0 +1,50 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+from app.commons.registry import ClientRegistry
+
+
+async def test_init_connection_creates_clients_only_once(mocker):
+    get_object_storage_client = mocker.patch(
+        'app.commons.registry.get_object_storage_client', return_value=mocker.Mock()
+    )
+    get_boto3_client = mocker.patch('app.commons.registry.get_boto3_client', return_value=mocker.Mock())
+    registry = ClientRegistry()
+
+    await registry.init_connection()
+    boto3_client = registry.boto3_client
+    await registry.init_connection()
+
+    assert get_object_storage_client.call_count == 1
+    assert get_boto3_client.call_count == 1
+    assert registry.boto3_client is boto3_client
+    assert get_object_storage_client.call_args.kwargs['max_pool_connections'] == 1000
+    assert registry.boto3_client_public is not None
+    assert registry.project_client is not None
+
+
+async def test_get_http_client_returns_shared_client_and_counts_requests(httpx_mock):
+    httpx_mock.add_response(url='http://service/a', json={})
+    registry = ClientRegistry()
+
+    client = registry.get_http_client()
+    await client.get('http://service/a')
+
+    assert registry.get_http_client() is client
+    assert registry.get_http_pool_usage() == {'max_connections': 100, 'in_flight': 0, 'requests': 1, 'responses': 1}
+    await registry.close_connection()
+
+
+async def test_close_connection_closes_shared_http_client():
+    registry = ClientRegistry()
+    client = registry.get_http_client()
+
+    await registry.close_connection()
+
+    assert client.is_closed
+    assert registry.http_client is None
+    assert registry.get_http_client() is not client
+    await registry.close_connection()
@@ -5,6 +5,7 @@
 # You may not use this file except in compliance with the License.
 
 import asyncio
+import fnmatch
 import json
 import os
 import shutil
@@ -15,6 +16,7 @@ import pytest
 from async_asgi_testclient import TestClient as TestAsyncClient
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from httpx import Request
 from httpx import Response
 from starlette.config import environ
 from urllib3 import HTTPResponse
@@ -154,22 +156,60 @@ def mock_boto3(monkeypatch, app):
     async def fake_part_upload(x, y, z, z1, z2, z3):
         pass
 
+    async def fake_generate_presigned_url(x, y, z, z1, z2):
+        return 'http://s3_internal/presigned'
+
     async def fake_combine_chunks(x, y, z, z1, z2):
         return {'VersionId': 'fake_version'}
 
     async def fake_download_object(x, y, z, z1):
         return response
 
+    async def fake_get_download_presigned_url(x, y, z):
+        return 'http://s3_internal/download'
+
     async def fake_list_chunks(x, y, z, z1):
         return {'Parts': []}
 
     monkeypatch.setattr(Boto3Client, 'init_connection', lambda x: fake_init_connection())
     monkeypatch.setattr(Boto3Client, 'prepare_multipart_upload', lambda x, y, z: fake_prepare_multipart_upload(x, y, z))
     monkeypatch.setattr(Boto3Client, 'part_upload', lambda x, y, z, z1, z2, z3: fake_part_upload(x, y, z, z1, z2, z3))
+    monkeypatch.setattr(
+        Boto3Client,
+        'generate_presigned_url',
+        lambda x, y, z, z1, z2: fake_generate_presigned_url(x, y, z, z1, z2),
+    )
     monkeypatch.setattr(Boto3Client, 'combine_chunks', lambda x, y, z, z1, z2: fake_combine_chunks(x, y, z, z1, z2))
     monkeypatch.setattr(Boto3Client, 'download_object', lambda x, y, z, z1: fake_download_object(x, y, z, z1))
+    monkeypatch.setattr(
+        Boto3Client, 'get_download_presigned_url', lambda x, y, z: fake_get_download_presigned_url(x, y, z)
+    )
     monkeypatch.setattr(Boto3Client, 'list_chunks', lambda x, y, z, z1: fake_list_chunks(x, y, z, z1))
 
+    async def fake_list_all_parts(x, y, z, z1, z2=None):
+        return []
+
+    monkeypatch.setattr('app.routers.v1.api_data_upload.list_all_parts', fake_list_all_parts)
+
+
+@pytest.fixture
+def mock_ranged_download(httpx_mock):
+    """Serve the content on the download url with HTTP Range support."""
+
+    def register(content: bytes, url: str = 'http://s3_internal/download') -> None:
+        def callback(request: Request) -> Response:
+            start, end = request.headers['Range'].removeprefix('bytes=').split('-')
+            start, end = int(start), min(int(end), len(content) - 1)
+            return Response(
+                status_code=206,
+                content=content[start : end + 1],
+                headers={'Content-Range': f'bytes {start}-{end}/{len(content)}'},
+            )
+
+        httpx_mock.add_callback(callback, url=url)
+
+    return register
+
 
 @pytest.fixture
 def mock_kafka_producer(monkeypatch):
@@ -205,8 +245,234 @@ def mock_redis(monkeypatch):
     async def fake_get(x):
         return {}
 
+    async def fake_mget(keys):
+        return [None for _ in keys]
+
+    async def fake_mset_if_not_exists(items):
+        return [True for _ in items]
+
     monkeypatch.setattr(SrvAioRedisSingleton, 'set_by_key', lambda x, y, z: fake_set(y, z))
     monkeypatch.setattr(SrvAioRedisSingleton, 'get_by_key', lambda x, y: fake_get(y))
+    monkeypatch.setattr(SrvAioRedisSingleton, 'mget_by_keys', lambda x, y: fake_mget(y))
+    monkeypatch.setattr(SrvAioRedisSingleton, 'mset_if_not_exists', lambda x, y: fake_mset_if_not_exists(y))
+
+
+def _encode(value) -> bytes:
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+def _decode(key) -> str:
+    return key.decode() if isinstance(key, bytes) else key
+
+
+class FakePubSub:
+    def __init__(self, redis: 'FakeRedis') -> None:
+        self.redis = redis
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.setdefault(channel, []).append(self)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        for subscribers in self.redis.subscribers.values():
+            if self in subscribers:
+                subscribers.remove(self)
+
+
+class FakePipeline:
+    """Queue the commands and run them against the fake redis on execute."""
+
+    def __init__(self, redis: 'FakeRedis') -> None:
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+
+        return command
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+class FakeRedis:
+    """
+    The in memory redis with the commands used by SrvAioRedisSingleton.
+    The keys are kept as str and the values are read back as bytes. The
+    stream commands serve a single consumer group.
+    """
+
+    def __init__(self) -> None:
+        self.data = {}
+        self.hashes = {}
+        self.bits = {}
+        self.scores = {}
+        self.streams = {}
+        self.pending = {}
+        self.delivered = set()
+        self.subscribers = {}
+        self.sequence = 0
+        self.clock = 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def get(self, key):
+        value = self.data.get(_decode(key))
+        return None if value is None else _encode(value)
+
+    async def set(self, key, content, ex=None, nx=False):
+        if nx and _decode(key) in self.data:
+            return None
+        self.data[_decode(key)] = _encode(content)
+        return True
+
+    async def mget(self, keys):
+        return [await self.get(key) for key in keys]
+
+    async def exists(self, key):
+        return int(any(_decode(key) in store for store in [self.data, self.hashes, self.bits]))
+
+    async def delete(self, *keys):
+        for key in map(_decode, keys):
+            for store in [self.data, self.hashes, self.bits, self.scores]:
+                store.pop(key, None)
+
+    async def unlink(self, *keys):
+        await self.delete(*keys)
+
+    async def expire(self, key, expire_time):
+        return True
+
+    async def incrby(self, key, amount):
+        self.data[_decode(key)] = int(self.data.get(_decode(key), 0)) + amount
+        return self.data[_decode(key)]
+
+    async def decrby(self, key, amount):
+        return await self.incrby(key, -amount)
+
+    async def scan_iter(self, match, count=None):
+        for key in list(self.data):
+            if fnmatch.fnmatch(key, match):
+                yield key.encode()
+
+    async def keys(self, pattern):
+        raise AssertionError('KEYS must not be used')
+
+    async def getbit(self, key, offset):
+        return int(offset in self.bits.get(key, set()))
+
+    async def setbit(self, key, offset, value):
+        self.bits.setdefault(key, set()).add(offset)
+
+    async def hget(self, key, field):
+        return self.hashes.get(key, {}).get(_decode(field))
+
+    async def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[_decode(field)] = _encode(value)
+
+    async def hmget(self, key, fields):
+        return [await self.hget(key, field) for field in fields]
+
+    async def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(_decode(field), None)
+
+    async def hlen(self, key):
+        return len(self.hashes.get(key, {}))
+
+    async def hgetall(self, key):
+        return {field.encode(): value for field, value in self.hashes.get(key, {}).items()}
+
+    async def publish(self, channel, message):
+        for subscriber in self.subscribers.get(channel, []):
+            subscriber.messages.put_nowait({'type': 'message', 'data': message})
+
+    async def zadd(self, key, mapping):
+        # the insertion order stands for the time, so the tests do not depend on clock
+        for member in mapping:
+            self.clock += 1
+            self.scores.setdefault(key, {})[member] = self.clock
+
+    async def zrange(self, key, start, end):
+        members = sorted(self.scores.get(key, {}), key=self.scores.get(key, {}).get)
+        return members[start : end + 1]
+
+    async def zrem(self, key, *members):
+        for member in members:
+            self.scores.get(key, {}).pop(member, None)
+
+    async def xgroup_create(self, name, groupname, **kwargs):
+        self.streams.setdefault(name, {})
+
+    async def xadd(self, name, fields):
+        self.sequence += 1
+        entry_id = f'{1000 + self.sequence}-0'.encode()
+        self.streams.setdefault(name, {})[entry_id] = {key.encode(): value for key, value in fields.items()}
+        return entry_id
+
+    async def xreadgroup(self, groupname, consumername, streams, count=None, block=None):
+        name = list(streams)[0]
+        entries = [(i, f) for i, f in self.streams[name].items() if i not in self.delivered][:count]
+        if not entries:
+            await asyncio.sleep(0.01)
+            return []
+        for entry_id, _ in entries:
+            self.delivered.add(entry_id)
+            self.pending[entry_id] = 1
+        return [[name.encode(), entries]]
+
+    async def xpending_range(self, name, groupname, start, end, count):
+        ids = [i for i in self.pending if start in ('-', i)][:count]
+        return [
+            {'message_id': i, 'consumer': b'c', 'time_since_delivered': 0, 'times_delivered': self.pending[i]}
+            for i in ids
+        ]
+
+    async def xclaim(self, name, groupname, consumername, min_idle_time, message_ids):
+        for entry_id in message_ids:
+            self.pending[entry_id] += 1
+        return [(entry_id, self.streams[name].get(entry_id)) for entry_id in message_ids]
+
+    async def xack(self, name, groupname, *ids):
+        for entry_id in ids:
+            self.pending.pop(entry_id, None)
+
+    async def xdel(self, name, *ids):
+        for entry_id in ids:
+            self.streams[name].pop(entry_id, None)
+
+    async def xlen(self, name):
+        return len(self.streams.get(name, {}))
+
+    async def xpending(self, name, groupname):
+        return {'pending': len(self.pending)}
+
+    async def xrange(self, name, count=None):
+        return list(self.streams.get(name, {}).items())[:count]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake_redis = FakeRedis()
+    monkeypatch.setattr('app.commons.data_providers.redis.REDIS_INSTANCE', fake_redis)
+    return fake_redis
 
 
 pytest_plugins = [
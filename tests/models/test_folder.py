@@ -0,0 +1,57 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import json
+
+import pytest
+
+from app.models.folder import FolderMgr
+from app.routers.v1.exceptions import InvalidPayload
+
+REDIS = 'app.commons.data_providers.redis.SrvAioRedisSingleton'
+
+
+async def test_folder_mgr_resolves_each_distinct_folder_once(mocker):
+    mget_by_keys = mocker.patch(f'{REDIS}.mget_by_keys', side_effect=lambda keys: [None] * len(keys))
+    mset_if_not_exists = mocker.patch(f'{REDIS}.mset_if_not_exists', side_effect=lambda items: [True] * len(items))
+    folder_mgr = FolderMgr('project', 'admin/test', 'parent-id')
+
+    last_node_ids = await folder_mgr.create('me', ['admin/test/a/b', 'admin/test/a/b', 'admin/test/a/c', 'admin/test'])
+
+    mget_by_keys.assert_called_once()
+    assert len(mget_by_keys.call_args.args[0]) == 4
+    mset_if_not_exists.assert_called_once()
+    folders = {(item['parent_path'], item['name']): item for item in folder_mgr.to_create}
+    assert set(folders) == {('admin', 'test'), ('admin/test', 'a'), ('admin/test/a', 'b'), ('admin/test/a', 'c')}
+    assert folders[('admin', 'test')]['parent'] == 'parent-id'
+    assert folders[('admin/test/a', 'b')]['parent'] == folders[('admin/test', 'a')]['id']
+    assert last_node_ids == [
+        folders[('admin/test/a', 'b')]['id'],
+        folders[('admin/test/a', 'b')]['id'],
+        folders[('admin/test/a', 'c')]['id'],
+        folders[('admin', 'test')]['id'],
+    ]
+
+
+async def test_folder_mgr_reuses_folder_registered_first_by_another_upload(mocker):
+    winner = json.dumps({'global_entity_id': 'winner-id', 'folder_parent_geid': 'parent-id', 'project_code': 'project'})
+    mocker.patch(f'{REDIS}.mget_by_keys', side_effect=[[None, None, None], [winner]])
+    mocker.patch(f'{REDIS}.mset_if_not_exists', return_value=[True, False, True])
+    mset_by_keys = mocker.patch(f'{REDIS}.mset_by_keys')
+    folder_mgr = FolderMgr('project', 'admin/test', 'parent-id')
+
+    last_node_ids = await folder_mgr.create('me', ['admin/test/a/b'])
+
+    assert last_node_ids == [folder_mgr.to_create[1]['id']]
+    assert [item['name'] for item in folder_mgr.to_create] == ['test', 'b']
+    assert folder_mgr.to_create[1]['parent'] == 'winner-id'
+    relinked = mset_by_keys.call_args.args[0]
+    assert json.loads(relinked['dev/project/admin/test/a/b'])['folder_parent_geid'] == 'winner-id'
+
+
+async def test_folder_mgr_raises_invalid_payload_for_project_level_folder():
+    with pytest.raises(InvalidPayload):
+        await FolderMgr('project', 'root', 'parent-id').create('me', ['root/a'])
@@ -4,9 +4,18 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
+import io
+import json
+import pickle
+import tarfile
+
 import pytest
 
+from app.resources.helpers import Archive
+from app.resources.helpers import ArchiveFile
 from app.resources.helpers import generate_archive_preview
+from app.resources.helpers import iter_archive_payload
+from app.resources.helpers import read_tar
 
 pytestmark = pytest.mark.asyncio
 
@@ -22,7 +31,7 @@ pytestmark = pytest.mark.asyncio
 )
 async def test_generate_archive_preview(file_path, file_type):
     archive_preview = await generate_archive_preview(file_path, file_type)
-    assert archive_preview == {
+    assert archive_preview.get_structure() == {
         'archive': {
             'is_dir': True,
             'folder1': {
@@ -38,7 +47,109 @@ async def test_generate_archive_preview(file_path, file_type):
 async def test_generate_archive_preview_when_file_mimetype_is_different_from_extension(caplog):
     archive_preview = await generate_archive_preview('tests/resources/desktop.rar', 'rar')
     assert caplog.records[0].message == 'file type rar is wrong based on file mine type application/x-tar'
-    assert archive_preview == {
+    assert archive_preview.get_structure() == {
         'bff.json': {'filename': 'bff.json', 'size': 34822, 'is_dir': False},
         'dataset.json': {'filename': 'dataset.json', 'size': 36439, 'is_dir': False},
     }
+
+
+async def test_read_tar_streams_headers_and_marks_truncated_preview(mocker, tmp_path):
+    mocker.patch('app.resources.helpers.ConfigClass.ARCHIVE_PREVIEW_MAX_ENTRIES', 3)
+    archive_path = tmp_path / 'archive.tar.gz'
+    with tarfile.open(archive_path, 'w:gz') as archive:
+        for index in range(50):
+            file_info = tarfile.TarInfo(f'folder/file{index}.txt')
+            file_info.size = 4
+            archive.addfile(file_info, io.BytesIO(b'data'))
+    next_header = mocker.spy(tarfile.TarFile, 'next')
+
+    preview = read_tar(str(archive_path))
+
+    assert preview.get_structure() == {
+        'folder': {
+            'is_dir': True,
+            'file0.txt': {'filename': 'file0.txt', 'size': 4, 'is_dir': False},
+            'file1.txt': {'filename': 'file1.txt', 'size': 4, 'is_dir': False},
+            'file2.txt': {'filename': 'file2.txt', 'size': 4, 'is_dir': False},
+        },
+        'Warning: The preview only contains the first 3 entries': '',
+    }
+    # the walk stops right after the cap instead of reading every header
+    assert next_header.call_count <= 5
+
+
+class FakeFile(ArchiveFile):
+    def __init__(self, name: str, is_dir: bool = False, size: int = 1) -> None:
+        self._name = name
+        self._is_dir = is_dir
+        self._size = size
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def is_dir(self) -> bool:
+        return self._is_dir
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+
+async def test_archive_keeps_compact_columns_and_streams_nested_payload(mocker):
+    mocker.patch('app.resources.helpers.ConfigClass.ARCHIVE_PREVIEW_STREAM_CHUNK_SIZE', 16)
+    files = [
+        FakeFile('a/', is_dir=True),
+        FakeFile('a/b/"quoted".txt', size=3),
+        FakeFile('a/c.txt', size=2),
+        FakeFile('a/b/d/e.txt'),
+        FakeFile('root.txt', size=5),
+    ]
+    archive = pickle.loads(pickle.dumps(Archive(files)))
+    archive.add(FakeFile('a/b/f.txt'))
+
+    expected = {
+        'a': {
+            'is_dir': True,
+            'b': {
+                'is_dir': True,
+                'd': {'is_dir': True, 'e.txt': {'filename': 'e.txt', 'size': 1, 'is_dir': False}},
+                '"quoted".txt': {'filename': '"quoted".txt', 'size': 3, 'is_dir': False},
+                'f.txt': {'filename': 'f.txt', 'size': 1, 'is_dir': False},
+            },
+            'c.txt': {'filename': 'c.txt', 'size': 2, 'is_dir': False},
+        },
+        'root.txt': {'filename': 'root.txt', 'size': 5, 'is_dir': False},
+    }
+    assert archive.get_structure() == expected
+    assert archive.names == ['a', 'b', '"quoted".txt', 'c.txt', 'd', 'e.txt', 'root.txt', 'f.txt']
+
+    pieces = [piece async for piece in iter_archive_payload(archive, 'file-id')]
+
+    assert len(pieces) > 1
+    assert json.loads(b''.join(pieces)) == {'archive_preview': expected, 'file_id': 'file-id'}
+
+
+async def test_archive_marker_is_kept_in_payload():
+    archive = Archive.from_marker('Error: The file is not a valid zip file')
+
+    pieces = [piece async for piece in iter_archive_payload(archive, 'file-id')]
+
+    assert json.loads(b''.join(pieces)) == {
+        'archive_preview': {'Error: The file is not a valid zip file': ''},
+        'file_id': 'file-id',
+    }
+
+
+async def test_archive_dump_and_load_keeps_structure_and_markers():
+    archive = Archive([FakeFile('a/b.txt', size=3), FakeFile('a/c/', is_dir=True)], max_entries=3)
+    archive.markers.append('marker')
+
+    loaded = Archive.load(archive.dump())
+    loaded.add(FakeFile('a/d.txt'))
+
+    archive.add(FakeFile('a/d.txt'))
+    assert loaded.get_structure() == archive.get_structure()
+    assert loaded.markers == ['marker']
+    assert loaded.entries == 3
@@ -0,0 +1,48 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import time
+
+import pytest
+
+from app.resources.preview_pool import ArchivePreviewPool
+from app.resources.preview_pool import PreviewLimitExceeded
+
+pytestmark = pytest.mark.asyncio
+
+
+def sleep_for(seconds: int) -> int:
+    time.sleep(seconds)
+    return seconds
+
+
+def allocate(size: int) -> int:
+    return len(bytearray(size))
+
+
+@pytest.fixture
+def pool():
+    pool = ArchivePreviewPool(workers=1, timeout=1, memory_limit=512 * 1024 * 1024)
+    yield pool
+    pool.shutdown()
+
+
+async def test_preview_pool_returns_result_of_worker(pool):
+    assert await pool.run(sleep_for, 0) == 0
+    assert pool.stats.dict()['completed'] == 1
+
+
+async def test_preview_pool_stops_job_after_timeout(pool):
+    with pytest.raises(PreviewLimitExceeded, match='time limit'):
+        await pool.run(sleep_for, 10)
+
+    assert pool.stats.dict()['limit_exceeded'] == 1
+    assert await pool.run(sleep_for, 0) == 0
+
+
+async def test_preview_pool_stops_job_over_memory_limit(pool):
+    with pytest.raises(PreviewLimitExceeded, match='memory limit'):
+        await pool.run(allocate, 1024 * 1024 * 1024)
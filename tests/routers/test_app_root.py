@@ -18,3 +18,23 @@ async def test_root_request_should_return_app_status(test_async_client):
         'name': ConfigClass.APP_NAME,
         'version': ConfigClass.VERSION,
     }
+
+
+@pytest.mark.asyncio
+async def test_metrics_request_should_return_http_pool_usage(test_async_client):
+    response = await test_async_client.get('/v1/metrics')
+    assert response.status_code == 200
+    assert set(response.json()['http_pool']) == {'max_connections', 'in_flight', 'requests', 'responses'}
+    assert response.json()['object_storage_pool']['max_connections'] == 50
+    assert set(response.json()['kafka']) == {
+        'sent',
+        'delivered',
+        'failed',
+        'pending',
+        'spooled',
+        'replayed',
+        'rejected',
+        'spool_bytes',
+    }
+    assert response.json()['archive_preview']['workers'] == 2
+    assert response.json()['finalize_queue']['depth'] == 0
@@ -8,6 +8,9 @@ from unittest import mock
 
 import pytest
 
+from app.commons.data_providers.redis_project_session_job import EFileStatus
+from app.commons.data_providers.redis_project_session_job import SessionJob
+
 pytestmark = pytest.mark.asyncio
 
 
@@ -48,6 +51,7 @@ async def test_upload_zip_should_allow_zip_preview(
     create_fake_job,
     mock_boto3,
     mock_kafka_producer,
+    mock_ranged_download,
     mocker,
 ):
 
@@ -58,6 +62,8 @@ async def test_upload_zip_should_allow_zip_preview(
         status_code=200,
     )
 
+    with open('tests/resources/archive.zip', 'rb') as archive:
+        mock_ranged_download(archive.read())
     httpx_mock.add_response(method='POST', url='http://DATAOPS_SERVICE/v1/archive', json={}, status_code=200)
 
     httpx_mock.add_response(
@@ -145,3 +151,132 @@ async def test_upload_any_file_should_return_200(
     assert result['container_type'] == 'project'
     assert result['action_type'] == 'data_upload'
     assert result['status'] == 'CHUNK_UPLOADED'
+
+
+async def test_on_success_adds_finalize_job_to_queue_when_queue_is_enabled(
+    test_async_client, httpx_mock, create_fake_job, mock_boto3, mocker
+):
+    mocker.patch('app.routers.v1.api_data_upload.ConfigClass.FINALIZE_QUEUE_ENABLED', True)
+    calls = []
+    set_status = SessionJob.set_status
+
+    async def record_status(self, status):
+        calls.append(status)
+        return await set_status(self, status)
+
+    mocker.patch.object(SessionJob, 'set_status', record_status)
+    enqueue = mocker.patch(
+        'app.routers.v1.api_data_upload.finalize_queue.enqueue', side_effect=lambda job: calls.append('enqueue')
+    )
+    finalize_worker = mocker.patch('app.routers.v1.api_data_upload.finalize_worker')
+    httpx_mock.add_response(method='POST', url='http://dataops_service/v1/task-stream/', json={}, status_code=200)
+
+    response = await test_async_client.post(
+        '/v1/files',
+        headers={'Session-Id': '1234'},
+        json={
+            'project_code': 'any',
+            'operator': 'me',
+            'job_id': 'fake_id',
+            'item_id': 'item_id',
+            'resumable_identifier': 'fake_global_entity_id',
+            'resumable_filename': 'any.zip',
+            'resumable_relative_path': './',
+            'resumable_total_chunks': 1,
+            'resumable_total_size': 10,
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.json()['result']['status'] == 'CHUNK_UPLOADED'
+    finalize_worker.assert_not_called()
+    assert calls == [EFileStatus.CHUNK_UPLOADED, 'enqueue']
+    job = enqueue.call_args.args[0]
+    assert job['session_id'] == '1234'
+    assert job['target_names'] == ['./any.zip']
+    assert job['request_payload']['resumable_identifier'] == 'fake_global_entity_id'
+
+
+async def test_finalize_worker_lists_parts_again_until_all_parts_are_present(httpx_mock, mock_kafka_producer, mocker):
+    from app.commons.data_providers.redis_project_session_job import SessionJob
+    from app.logger import logger
+    from app.models.models_upload import OnSuccessUploadPOST
+    from app.routers.v1.api_data_upload import finalize_worker
+
+    wait_for_uploaded_parts = mocker.patch('app.routers.v1.api_data_upload.wait_for_uploaded_parts', return_value=True)
+    mocker.patch('app.routers.v1.api_data_upload.get_uploaded_parts', return_value=[])
+    list_all_parts = mocker.patch(
+        'app.routers.v1.api_data_upload.list_all_parts',
+        side_effect=[[], [{'PartNumber': 1, 'ETag': '"etag"', 'Size': 10}]],
+    )
+    boto3_client = mocker.AsyncMock()
+    boto3_client.combine_chunks.return_value = {'VersionId': 'fake_version'}
+    httpx_mock.add_response(
+        method='PUT', url='http://metadata_service/v1/item/?id=item_id', json={'result': {'id': 'item_id'}}
+    )
+    httpx_mock.add_response(method='POST', url='http://dataops_service/v1/task-stream/', json={})
+    status_mgr = SessionJob('1234', 'any', 'me', 'fake_id')
+    status_mgr.set_source(['admin/a.txt'])
+    request_payload = OnSuccessUploadPOST(
+        project_code='any',
+        operator='me',
+        job_id='fake_id',
+        item_id='item_id',
+        resumable_identifier='upload_id',
+        resumable_filename='a.txt',
+        resumable_relative_path='admin',
+        resumable_total_chunks=1,
+        resumable_total_size=10,
+    )
+
+    await finalize_worker(logger, request_payload, status_mgr, boto3_client, 'unknown')
+
+    wait_for_uploaded_parts.assert_called_once_with('upload_id', 1)
+    assert list_all_parts.call_count == 2
+    boto3_client.combine_chunks.assert_called_once_with(
+        'core-any', 'admin/a.txt', 'upload_id', [{'PartNumber': 1, 'ETag': 'etag'}]
+    )
+    assert status_mgr.status.name == 'SUCCEED'
+
+
+async def test_finalize_worker_combines_parts_from_ledger_without_listing(httpx_mock, mock_kafka_producer, mocker):
+    from app.commons.data_providers.redis_project_session_job import SessionJob
+    from app.logger import logger
+    from app.models.models_upload import OnSuccessUploadPOST
+    from app.routers.v1.api_data_upload import finalize_worker
+
+    mocker.patch('app.routers.v1.api_data_upload.wait_for_uploaded_parts', return_value=True)
+    mocker.patch(
+        'app.routers.v1.api_data_upload.get_uploaded_parts',
+        return_value=[{'PartNumber': 1, 'ETag': 'etag1', 'Size': 5}, {'PartNumber': 2, 'ETag': 'etag2', 'Size': 5}],
+    )
+    clear_uploaded_parts = mocker.patch('app.routers.v1.api_data_upload.clear_uploaded_parts')
+    list_all_parts = mocker.patch('app.routers.v1.api_data_upload.list_all_parts')
+    boto3_client = mocker.AsyncMock()
+    boto3_client.combine_chunks.return_value = {'VersionId': 'fake_version'}
+    httpx_mock.add_response(
+        method='PUT', url='http://metadata_service/v1/item/?id=item_id', json={'result': {'id': 'item_id'}}
+    )
+    httpx_mock.add_response(method='POST', url='http://dataops_service/v1/task-stream/', json={})
+    status_mgr = SessionJob('1234', 'any', 'me', 'fake_id')
+    status_mgr.set_source(['admin/a.txt'])
+    request_payload = OnSuccessUploadPOST(
+        project_code='any',
+        operator='me',
+        job_id='fake_id',
+        item_id='item_id',
+        resumable_identifier='upload_id',
+        resumable_filename='a.txt',
+        resumable_relative_path='admin',
+        resumable_total_chunks=2,
+        resumable_total_size=10,
+    )
+
+    await finalize_worker(logger, request_payload, status_mgr, boto3_client, 'unknown')
+
+    list_all_parts.assert_not_called()
+    boto3_client.combine_chunks.assert_called_once_with(
+        'core-any', 'admin/a.txt', 'upload_id', [{'PartNumber': 1, 'ETag': 'etag1'}, {'PartNumber': 2, 'ETag': 'etag2'}]
+    )
+    clear_uploaded_parts.assert_called_once_with('upload_id')
+    assert status_mgr.status.name == 'SUCCEED'
@@ -5,6 +5,7 @@
 # You may not use this file except in compliance with the License.
 
 import pytest
+from httpx import Response
 
 pytestmark = pytest.mark.asyncio
 
@@ -42,6 +43,9 @@ async def test_upload_chunks_return_200_when_when_success(
     mock_boto3,
     mock_redis,
 ):
+    httpx_mock.add_response(
+        method='PUT', url='http://s3_internal/presigned', headers={'ETag': '"fake-etag"'}, status_code=200
+    )
 
     response = await test_async_client.post(
         '/v1/files/chunks',
@@ -67,3 +71,75 @@ async def test_upload_chunks_return_200_when_when_success(
         'num_of_pages': 1,
         'result': {'msg': 'Succeed'},
     }
+
+
+async def test_upload_raw_chunk_return_200_when_success(
+    test_async_client,
+    httpx_mock,
+    mock_boto3,
+):
+    httpx_mock.add_response(
+        method='PUT', url='http://s3_internal/presigned', headers={'ETag': '"fake-etag"'}, status_code=200
+    )
+
+    response = await test_async_client.post(
+        '/v1/files/chunks/fake_global_entity_id/1',
+        headers={'Session-Id': '1234', 'Content-Type': 'application/octet-stream'},
+        query_string={'project_code': 'any', 'operator': 'me', 'resumable_filename': 'any'},
+        data=b'raw chunk content',
+    )
+
+    assert response.status_code == 200
+    assert response.json()['result'] == {'msg': 'Succeed'}
+    request = httpx_mock.get_request()
+    assert request.headers['Content-Length'] == str(len(b'raw chunk content'))
+    assert await request.aread() == b'raw chunk content'
+
+
+async def test_upload_raw_chunk_return_400_when_session_id_header_is_missing(test_async_client, httpx_mock):
+    response = await test_async_client.post(
+        '/v1/files/chunks/fake_global_entity_id/1',
+        query_string={'project_code': 'any', 'operator': 'me', 'resumable_filename': 'any'},
+        data=b'raw chunk content',
+    )
+
+    assert response.status_code == 400
+    assert response.json()['error_msg'] == 'session_id is required'
+
+
+async def test_upload_raw_chunk_keeps_archive_edges_when_capture_enabled(
+    test_async_client,
+    httpx_mock,
+    mock_boto3,
+    mocker,
+):
+    mocker.patch('app.commons.archive_index.ConfigClass.ARCHIVE_INDEX_CAPTURE_ENABLED', True)
+    mocker.patch('app.commons.archive_index.ConfigClass.ARCHIVE_INDEX_CAPTURE_SIZE', 4)
+    mset_by_keys = mocker.patch('app.commons.data_providers.redis.SrvAioRedisSingleton.mset_by_keys')
+
+    async def read_part(request):
+        await request.aread()
+        return Response(status_code=200, headers={'ETag': '"fake-etag"'})
+
+    httpx_mock.add_callback(read_part, method='PUT', url='http://s3_internal/presigned')
+
+    response = await test_async_client.post(
+        '/v1/files/chunks/fake_global_entity_id/1',
+        headers={'Session-Id': '1234', 'Content-Type': 'application/octet-stream'},
+        query_string={
+            'project_code': 'any',
+            'operator': 'me',
+            'resumable_filename': 'any.zip',
+            'resumable_total_chunks': 1,
+        },
+        data=b'raw chunk content',
+    )
+
+    assert response.status_code == 200
+    mset_by_keys.assert_called_once_with(
+        {
+            'upload:archive_index:fake_global_entity_id:head': b'raw ',
+            'upload:archive_index:fake_global_entity_id:tail': b'tent',
+        },
+        86400,
+    )
@@ -4,9 +4,14 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
+import re
+
 import pytest
 from common import ProjectNotFoundException
 
+from app.models.models_upload import SingleFileForm
+from app.routers.v1.api_data_upload import get_conflict_file_paths
+
 pytestmark = pytest.mark.asyncio
 
 
@@ -339,3 +344,62 @@ async def test_files_jobs_adds_folder_should_return_200_when_success(
     assert result['target_names'] == ['tests/tmp/any']
     assert result['action_type'] == 'data_upload'
     assert result['status'] == 'RUNNING'
+
+
+async def test_get_conflict_file_paths_lists_small_folder_once(mocker, httpx_mock):
+    mocker.patch('app.routers.v1.api_data_upload.ConfigClass.METADATA_SEARCH_PAGE_SIZE', 2)
+    httpx_mock.add_response(
+        method='GET',
+        url=re.compile(r'.*items/search/\?parent_path=admin%2Ffolder&.*page_size=1&page=0$'),
+        json={'result': [{'name': 'a.txt'}], 'total': 3, 'num_of_pages': 3},
+    )
+    httpx_mock.add_response(
+        method='GET',
+        url=re.compile(r'.*items/search/\?parent_path=admin%2Ffolder&.*page_size=2&page=0$'),
+        json={'result': [{'name': 'a.txt'}, {'name': 'other.txt'}], 'total': 3, 'num_of_pages': 2},
+    )
+    httpx_mock.add_response(
+        method='GET',
+        url=re.compile(r'.*items/search/\?parent_path=admin%2Ffolder&.*page_size=2&page=1$'),
+        json={'result': [{'name': 'c.txt'}], 'total': 3, 'num_of_pages': 2},
+    )
+    httpx_mock.add_response(
+        method='GET',
+        url=re.compile(r'.*items/search/\?parent_path=admin&.*name=d.txt.*'),
+        json={'result': [], 'total': 0, 'num_of_pages': 1},
+    )
+    files = [('admin/folder', 'a.txt'), ('admin/folder', 'b.txt'), ('admin/folder', 'c.txt'), ('admin', 'd.txt')]
+    data = [SingleFileForm(resumable_filename=name, resumable_relative_path=path) for path, name in files]
+
+    result = await get_conflict_file_paths(data, 'project_code')
+
+    assert result == [
+        {'name': 'a.txt', 'relative_path': 'admin/folder', 'type': 'File'},
+        {'name': 'c.txt', 'relative_path': 'admin/folder', 'type': 'File'},
+    ]
+    assert len(httpx_mock.get_requests()) == 4
+
+
+async def test_get_conflict_file_paths_looks_up_names_in_large_folder(mocker, httpx_mock):
+    mocker.patch('app.routers.v1.api_data_upload.ConfigClass.METADATA_SEARCH_PAGE_SIZE', 2)
+    httpx_mock.add_response(
+        method='GET',
+        url=re.compile(r'.*items/search/\?parent_path=admin&.*page_size=1&page=0$'),
+        json={'result': [{'name': 'other.txt'}], 'total': 100, 'num_of_pages': 100},
+    )
+    httpx_mock.add_response(
+        method='GET',
+        url=re.compile(r'.*items/search/\?parent_path=admin&.*name=a.txt$'),
+        json={'result': [{'name': 'a.txt'}], 'total': 1, 'num_of_pages': 1},
+    )
+    httpx_mock.add_response(
+        method='GET',
+        url=re.compile(r'.*items/search/\?parent_path=admin&.*name=b.txt$'),
+        json={'result': [], 'total': 0, 'num_of_pages': 1},
+    )
+    data = [SingleFileForm(resumable_filename=name, resumable_relative_path='admin') for name in ['a.txt', 'b.txt']]
+
+    result = await get_conflict_file_paths(data, 'project_code')
+
+    assert result == [{'name': 'a.txt', 'relative_path': 'admin', 'type': 'File'}]
+    assert len(httpx_mock.get_requests()) == 3
@@ -4,7 +4,11 @@
 # Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
 # You may not use this file except in compliance with the License.
 
+import asyncio
+import json
+
 import botocore.exceptions
+import pytest
 from common.object_storage_adaptor.boto3_client import Boto3Client
 
 from app.models.models_resumable_upload import ObjectInfo
@@ -12,6 +16,11 @@ from app.routers.exceptions import NotFound
 from app.routers.v1.api_resumable_upload.utils import get_chunks_info
 
 
+@pytest.fixture(autouse=True)
+def empty_part_ledger(mocker):
+    mocker.patch('app.routers.v1.api_resumable_upload.utils.get_uploaded_parts', return_value=[])
+
+
 async def test_resumable_success_return_200(test_async_client, mocker):
     mocker.patch('app.routers.v1.api_resumable_upload.api_resumable_upload.get_chunks_info', return_value=['test'])
     response = await test_async_client.post(
@@ -51,8 +60,9 @@ async def test_get_chunks_info_skips_chunks_that_do_not_exist(mocker, fake):
     ]
 
     boto3_client = Boto3Client('', '', '')
-    boto3_client.list_chunks = mocker.AsyncMock(
-        side_effect=[{'Parts': []}, botocore.exceptions.ClientError({'Error': {'Code': 'NoSuchUpload'}}, 'ListParts')]
+    mocker.patch(
+        'app.routers.v1.api_resumable_upload.utils.list_all_parts',
+        side_effect=[[], botocore.exceptions.ClientError({'Error': {'Code': 'NoSuchUpload'}}, 'ListParts')],
     )
 
     chunks_info = await get_chunks_info(boto3_client, 'test-bucket', object_infos)
@@ -60,3 +70,55 @@ async def test_get_chunks_info_skips_chunks_that_do_not_exist(mocker, fake):
     assert len(chunks_info) == 1
     assert chunks_info[0]['object_path'] == object_infos[0].object_path
     assert chunks_info[0]['resumable_id'] == object_infos[0].resumable_id
+
+
+async def test_get_chunks_info_keeps_input_order_when_listed_concurrently(mocker):
+    object_infos = [ObjectInfo(object_path=f'path/{index}', resumable_id=f'id-{index}') for index in range(3)]
+
+    async def list_all_parts(boto3_client, bucket, object_path, upload_id):
+        await asyncio.sleep(0.01 * (3 - int(upload_id.split('-')[1])))
+        return [{'PartNumber': 1, 'ETag': f'"{upload_id}"'}]
+
+    boto3_client = Boto3Client('', '', '')
+    mocker.patch('app.routers.v1.api_resumable_upload.utils.list_all_parts', list_all_parts)
+
+    chunks_info = await get_chunks_info(boto3_client, 'test-bucket', object_infos, concurrency=3)
+
+    assert [chunk_info['chunks_info'] for chunk_info in chunks_info] == [{1: 'id-0'}, {1: 'id-1'}, {1: 'id-2'}]
+
+
+async def test_resumable_stream_returns_ndjson_lines(test_async_client, mocker):
+    mocker.patch(
+        'app.routers.v1.api_resumable_upload.utils.list_all_parts',
+        return_value=[{'PartNumber': 1, 'ETag': '"etag"'}],
+    )
+
+    response = await test_async_client.post(
+        '/v1/files/resumable',
+        query_string={'stream': 'true'},
+        json={'bucket': 'test', 'object_infos': [{'object_path': 'test', 'resumable_id': 'test'}]},
+    )
+
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [{'object_path': 'test', 'resumable_id': 'test', 'chunks_info': {'1': 'etag'}}]
+
+
+async def test_get_chunks_info_uses_part_ledger_before_listing_parts(mocker):
+    object_infos = [ObjectInfo(object_path=f'path/{index}', resumable_id=f'id-{index}') for index in range(2)]
+
+    async def get_uploaded_parts(upload_id):
+        return [{'PartNumber': 1, 'ETag': 'etag', 'Size': 10}] if upload_id == 'id-0' else []
+
+    boto3_client = Boto3Client('', '', '')
+    mocker.patch('app.routers.v1.api_resumable_upload.utils.get_uploaded_parts', get_uploaded_parts)
+    list_all_parts = mocker.patch(
+        'app.routers.v1.api_resumable_upload.utils.list_all_parts',
+        return_value=[{'PartNumber': 2, 'ETag': '"listed"'}],
+    )
+
+    chunks_info = await get_chunks_info(boto3_client, 'test-bucket', object_infos)
+
+    assert [chunk_info['chunks_info'] for chunk_info in chunks_info] == [{1: 'etag'}, {2: 'listed'}]
+    list_all_parts.assert_called_once_with(boto3_client, 'test-bucket', 'path/1', 'id-1')
@@ -0,0 +1,95 @@
+# Copyright (C) 2022-Present Indoc Systems
+#
+# Licensed under the GNU AFFERO GENERAL PUBLIC LICENSE,
+# Version 3.0 (the "License") available at https://www.gnu.org/licenses/agpl-3.0.en.html.
+# You may not use this file except in compliance with the License.
+
+import asyncio
+
+from app.routers.v1.api_data_upload import run_finalize_job
+from app.worker import run_worker
+
+
+async def test_run_worker_consumes_finalize_queue_until_stopped(mocker):
+    mocker.patch('app.worker.client_registry.init_connection')
+    mocker.patch('app.worker.client_registry.connect_kafka')
+    close_connection = mocker.patch('app.worker.client_registry.close_connection')
+    start = mocker.patch('app.worker.finalize_queue.start')
+    stop_queue = mocker.patch('app.worker.finalize_queue.stop')
+    shutdown = mocker.patch('app.worker.preview_pool.shutdown')
+    stop = asyncio.Event()
+
+    worker = asyncio.create_task(run_worker(stop))
+    await asyncio.sleep(0)
+    start.assert_called_once_with(run_finalize_job)
+    stop_queue.assert_not_called()
+
+    stop.set()
+    await worker
+
+    stop_queue.assert_called_once()
+    close_connection.assert_called_once()
+    shutdown.assert_called_once()
+
+
+async def test_run_finalize_job_rebuilds_job_status(mocker):
+    boto3_client = mocker.Mock()
+    mocker.patch('app.routers.v1.api_data_upload.get_internal_boto3_client', return_value=boto3_client)
+    finalize_worker = mocker.patch('app.routers.v1.api_data_upload.finalize_worker')
+
+    await run_finalize_job(
+        {
+            'request_payload': {
+                'project_code': 'any',
+                'operator': 'me',
+                'job_id': 'job_id',
+                'item_id': 'item_id',
+                'resumable_identifier': 'upload_id',
+                'resumable_filename': 'a.txt',
+                'resumable_relative_path': 'admin',
+                'resumable_total_chunks': 1,
+                'resumable_total_size': 10,
+            },
+            'session_id': 'session_id',
+            'target_names': ['admin/a.txt'],
+            'network_origin': 'unknown',
+        }
+    )
+
+    _, request_payload, status_mgr, client, network_origin = finalize_worker.call_args.args
+    assert request_payload.resumable_identifier == 'upload_id'
+    assert (status_mgr.session_id, status_mgr.job_id, status_mgr.target_names) == (
+        'session_id',
+        'job_id',
+        ['admin/a.txt'],
+    )
+    assert client is boto3_client
+    assert network_origin == 'unknown'
+
+
+async def test_run_finalize_job_finishes_job_marked_as_failed(mocker):
+    mocker.patch('app.routers.v1.api_data_upload.get_internal_boto3_client', return_value=mocker.Mock())
+    finalize_worker = mocker.patch(
+        'app.routers.v1.api_data_upload.finalize_worker', side_effect=Exception('fail to combine chunks')
+    )
+
+    await run_finalize_job(
+        {
+            'request_payload': {
+                'project_code': 'any',
+                'operator': 'me',
+                'job_id': 'job_id',
+                'item_id': 'item_id',
+                'resumable_identifier': 'upload_id',
+                'resumable_filename': 'a.txt',
+                'resumable_relative_path': 'admin',
+                'resumable_total_chunks': 1,
+                'resumable_total_size': 10,
+            },
+            'session_id': 'session_id',
+            'target_names': ['admin/a.txt'],
+            'network_origin': 'unknown',
+        }
+    )
+
+    finalize_worker.assert_called_once()